@@ -1,28 +1,197 @@
 import cv2
 import numpy as np
-import csv
 import os
 from datetime import datetime
-from collections import deque
 
 from PyQt5.QtWidgets import (
     QLabel, QPushButton, QWidget,
     QVBoxLayout, QHBoxLayout, QMessageBox, QFrame
 )
 from PyQt5.QtGui import QImage, QPixmap, QFont
-from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtCore import QTimer, Qt, QThread, QObject, QRunnable, QThreadPool, pyqtSignal
 
 import pyqtgraph as pg
 import mediapipe as mp
+from scipy.signal import decimate
 
-from utils import FACE_REGIONS, draw_face_roi, draw_shoulders, extract_face_roi_rgb, extract_shoulder_distance
+from utils import FACE_REGIONS_IDX, BufferedCsvWriter, draw_shoulders, extract_shoulder_distance, landmarks_to_pixels, process_face
 from signal_processing import cpu_POS, apply_bandpass_filter, estimate_bpm, estimate_brpm
 
+BUFFER_SIZE = 150
+DETECT_SIZE = (320, 240)
+POSE_INTERVAL = 3
+RESP_DECIMATION = 6
+
+def ring_snapshot(buf, idx, count):
+    """
+    Mengambil isi ring buffer dalam urutan kronologis (sampel terlama lebih dulu).
+    
+    Args:
+        buf (np.ndarray): Ring buffer dengan sumbu waktu sebagai sumbu terakhir
+        idx (int): Posisi tulis berikutnya pada ring buffer
+        count (int): Jumlah sampel valid yang sudah ditulis
+
+    Returns:
+        np.ndarray: Salinan sampel valid berurutan waktu
+    """
+    if count < buf.shape[-1]:
+        return buf[..., :count].copy()
+    return np.concatenate((buf[..., idx:], buf[..., :idx]), axis=-1)
+
 def convert_cv_qt(cv_img):
-    rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-    h, w, ch = rgb_image.shape
+    # QImage berbagi memori dengan cv_img (tanpa konversi BGR->RGB), jadi cv_img
+    # harus tetap hidup sampai QImage disalin, misalnya oleh QPixmap.fromImage
+    h, w, ch = cv_img.shape
     bytes_per_line = ch * w
-    return QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
+    return QImage(cv_img.data, w, h, bytes_per_line, QImage.Format_BGR888)
+
+class CaptureWorker(QThread):
+    """
+    Thread pengambilan frame kamera dan inferensi MediaPipe.
+    Hasil tiap frame dikirim ke GUI melalui sinyal frame_ready sehingga
+    event loop Qt hanya menangani tampilan.
+    """
+    frame_ready = pyqtSignal(np.ndarray, tuple, float, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cap = None
+        self.running = False
+        self.frame_idx = 0
+        self.pose_landmarks = None
+        self.face_mesh = mp.solutions.face_mesh.FaceMesh(refine_landmarks=True)
+        self.pose = mp.solutions.pose.Pose()
+
+    def stop(self):
+        """
+        Menghentikan loop pengambilan frame dan menunggu thread selesai.
+        """
+        self.running = False
+        self.wait()
+
+    def run(self):
+        """
+        Loop utama: baca frame, deteksi ROI wajah dan bahu, lalu kirim hasilnya ke GUI.
+        Pose hanya dideteksi tiap POSE_INTERVAL frame karena sinyal respirasi berfrekuensi
+        rendah; frame di antaranya memakai landmark terakhir (jarak bahu ditahan). Jarak
+        NaN hanya untuk frame tanpa deteksi bahu yang valid, dan diinterpolasi saat analisis.
+        """
+        self.running = True
+        self.frame_idx = 0
+        self.pose_landmarks = None
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.msleep(10)
+                continue
+
+            frame = cv2.resize(frame, (640, 480))
+            # Landmark MediaPipe ternormalisasi (0-1), jadi deteksi cukup di frame kecil
+            small = cv2.resize(frame, DETECT_SIZE, interpolation=cv2.INTER_AREA)
+            rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+            face_result = self.face_mesh.process(rgb)
+            if face_result.multi_face_landmarks:
+                landmarks = face_result.multi_face_landmarks[0].landmark
+                h, w, _ = frame.shape
+                lm_px = landmarks_to_pixels(landmarks, w, h)
+                roi_rgb = process_face(frame, lm_px, FACE_REGIONS_IDX)
+                r = g = b = 0.0
+                for v in roi_rgb:
+                    r += v[0]
+                    g += v[1]
+                    b += v[2]
+                n = len(roi_rgb)
+                avg_rgb = (r / n, g / n, b / n)
+                status = "Status: Wajah terdeteksi"
+            else:
+                avg_rgb = (np.nan, np.nan, np.nan)
+                status = "Status: Wajah tidak terdeteksi"
+
+            distance = np.nan
+            pose_frame = self.frame_idx % POSE_INTERVAL == 0
+            self.frame_idx += 1
+            if pose_frame:
+                self.pose_landmarks = self.pose.process(rgb).pose_landmarks
+            if self.pose_landmarks:
+                draw_shoulders(frame, self.pose_landmarks.landmark)
+                shoulder = extract_shoulder_distance(self.pose_landmarks.landmark, min_visibility=0.3)
+                if shoulder is None:
+                    status = "Status: Bahu terdeteksi, tapi visibilitas rendah"
+                else:
+                    distance = shoulder
+            else:
+                status = "Status: Landmark pose tidak terdeteksi"
+
+            self.frame_ready.emit(frame, avg_rgb, float(distance), status)
+
+class AnalyzeSignals(QObject):
+    """
+    Sinyal Qt untuk mengirim hasil AnalyzeTask kembali ke thread GUI.
+    """
+    finished = pyqtSignal(object, np.ndarray, object, object)
+    failed = pyqtSignal(str)
+
+class AnalyzeTask(QRunnable):
+    """
+    Tugas analisis sinyal rPPG dan respirasi yang dijalankan di QThreadPool.
+    Bekerja pada salinan buffer sehingga tidak berbagi data dengan thread GUI.
+    """
+    def __init__(self, rgb, resp, fps):
+        """
+        Args:
+            rgb (np.ndarray): Salinan sinyal RGB dengan bentuk [3, frame]
+            resp (np.ndarray): Salinan sinyal jarak bahu
+            fps (int): Frame per detik (frekuensi sampling)
+        """
+        super().__init__()
+        self.rgb = rgb
+        self.resp = resp
+        self.fps = fps
+        self.signals = AnalyzeSignals()
+
+    def run(self):
+        """
+        Menjalankan analisis dan selalu mengirim hasil (signals.finished) atau
+        pesan error (signals.failed), supaya GUI bisa menjadwalkan analisis berikutnya.
+        """
+        try:
+            result = self.analyze()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(*result)
+
+    def analyze(self):
+        """
+        Menghitung BPM dan BRPM dari salinan buffer.
+
+        Returns:
+            tuple: (bpm, rppg_filtered, brpm, resp_filtered)
+        """
+        fps = self.fps
+        H = cpu_POS(self.rgb[np.newaxis], fps)
+        pos_signal = H[0]
+
+        rppg_filtered = apply_bandpass_filter(pos_signal, 0.9, 2.4, fps)
+        bpm = estimate_bpm(rppg_filtered, fps)
+
+        brpm = None
+        resp_filtered = None
+        valid = ~np.isnan(self.resp)
+        if valid.any():
+            # Isi sampel kosong (frame tanpa deteksi pose) dengan interpolasi linear
+            t = np.arange(len(self.resp))
+            resp = np.interp(t, t[valid], self.resp[valid])
+            # Respirasi (0.1-0.5 Hz) cukup diproses pada fps / RESP_DECIMATION (5 Hz)
+            resp = decimate(resp, RESP_DECIMATION, ftype='fir', zero_phase=True)
+            resp_fs = fps / RESP_DECIMATION
+            # sosfiltfilt bandpass orde 3 butuh lebih dari 21 sampel (padlen)
+            if len(resp) > 21:
+                resp_filtered = apply_bandpass_filter(resp, 0.1, 0.5, resp_fs)
+                brpm = estimate_brpm(resp_filtered, resp_fs)
+
+        return bpm, rppg_filtered, brpm, resp_filtered
 
 class VideoApp(QWidget):
     def __init__(self):
@@ -37,9 +206,9 @@ class VideoApp(QWidget):
 
         self.image_label = QLabel()
         self.image_label.setAlignment(Qt.AlignCenter)
-        placeholder = QPixmap(640, 480)
-        placeholder.fill(Qt.black)
-        self.image_label.setPixmap(placeholder)
+        self.placeholder = QPixmap(640, 480)
+        self.placeholder.fill(Qt.black)
+        self.image_label.setPixmap(self.placeholder)
 
         self.start_btn = QPushButton("Start Capture")
         self.stop_btn = QPushButton("Stop && Save Data")
@@ -60,6 +229,9 @@ class VideoApp(QWidget):
         self.plot_widget_resp.setLabel('left', 'Distance')
         self.plot_widget_resp.setLabel('bottom', 'Time (s)')
 
+        self.rppg_curve = self.plot_widget.plot(pen='g')
+        self.resp_curve = self.plot_widget_resp.plot(pen='b')
+
         font = QFont("Arial", 11, QFont.Bold)
         self.status_label = QLabel("Status: Waiting to start...")
         self.status_label.setFont(font)
@@ -107,23 +279,25 @@ class VideoApp(QWidget):
         self.setLayout(main_layout)
 
         self.cap = None
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_frame)
+        self.worker = CaptureWorker()
+        self.worker.frame_ready.connect(self.on_frame, Qt.QueuedConnection)
 
         self.analysis_timer = QTimer()
         self.analysis_timer.timeout.connect(self.analyze_signals)
+        self.analysis_busy = False
 
         self.duration_timer = QTimer()
         self.duration_timer.timeout.connect(self.update_duration)
         self.capture_start_time = None
 
-        self.face_mesh = mp.solutions.face_mesh.FaceMesh(refine_landmarks=True)
-        self.pose = mp.solutions.pose.Pose()
-
-        self.rgb_data = []
-        self.resp_data = []
-        self.rppg_buffer = deque(maxlen=150)
-        self.resp_buffer = deque(maxlen=150)
+        self.rgb_writer = None
+        self.resp_writer = None
+        self.rppg_buf = np.empty((3, BUFFER_SIZE), dtype=np.float32)
+        self.rppg_idx = 0
+        self.rppg_count = 0
+        self.resp_buf = np.empty(BUFFER_SIZE, dtype=np.float32)
+        self.resp_idx = 0
+        self.resp_count = 0
 
     def update_duration(self):
         """
@@ -142,17 +316,30 @@ class VideoApp(QWidget):
         if not self.cap.isOpened():
             QMessageBox.critical(self, "Error", "Tidak dapat membuka kamera.")
             return
+        # MJPEG mengurangi bandwidth USB dan didekode dengan libjpeg-turbo; buffer 1 frame
+        # mencegah frame basi menumpuk di driver
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.timer.start(30)
+        self.cap.set(cv2.CAP_PROP_FPS, 30)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        try:
+            self.rgb_writer = BufferedCsvWriter(f"output/rppg_rgb_{timestamp}.csv", ["R", "G", "B"])
+            self.resp_writer = BufferedCsvWriter(f"output/resp_signal_{timestamp}.csv", ["Shoulder_Distance"])
+        except OSError as e:
+            self.close_writers()
+            self.cap.release()
+            self.cap = None
+            QMessageBox.critical(self, "Error", f"Tidak dapat membuat file data: {str(e)}")
+            return
 
-        self.rgb_data.clear()
-        self.resp_data.clear()
-        self.rppg_buffer.clear()
-        self.resp_buffer.clear()
+        self.rppg_idx = self.rppg_count = 0
+        self.resp_idx = self.resp_count = 0
 
-        self.plot_widget.clear()
-        self.plot_widget_resp.clear()
+        self.rppg_curve.clear()
+        self.resp_curve.clear()
         self.bpm_card.setText("BPM: -")
         self.brpm_card.setText("BRPM: -")
         self.duration_label.setText("Duration: 0 s")
@@ -165,123 +352,151 @@ class VideoApp(QWidget):
         self.stop_btn.setEnabled(True)
         self.start_btn.setEnabled(False)
 
-    def update_frame(self):
+        self.worker.cap = self.cap
+        self.worker.start()
+
+    def push_rppg(self, rgb):
+        """
+        Menulis satu sampel RGB ke ring buffer rPPG.
+        
+        Args:
+            rgb (tuple): Nilai rata-rata R, G, B (NaN jika wajah tidak terdeteksi)
+        """
+        self.rppg_buf[:, self.rppg_idx] = rgb
+        self.rppg_idx = (self.rppg_idx + 1) % BUFFER_SIZE
+        self.rppg_count = min(self.rppg_count + 1, BUFFER_SIZE)
+
+    def push_resp(self, distance):
+        """
+        Menulis satu sampel jarak bahu ke ring buffer respirasi.
+        
+        Args:
+            distance (float): Jarak bahu (atau NaN jika tidak terdeteksi)
+        """
+        self.resp_buf[self.resp_idx] = distance
+        self.resp_idx = (self.resp_idx + 1) % BUFFER_SIZE
+        self.resp_count = min(self.resp_count + 1, BUFFER_SIZE)
+
+    def on_frame(self, frame, avg_rgb, distance, status):
         """
-        Memperbarui frame video secara real-time.
-        Deteksi ROI wajah dan bahu, hitung data rPPG & respirasi, dan update GUI.
+        Menerima hasil satu frame dari CaptureWorker, menyimpan data, dan memperbarui GUI.
+        
+        Args:
+            frame (np.ndarray): Frame BGR yang sudah diberi anotasi ROI
+            avg_rgb (tuple): Rata-rata R, G, B wajah (NaN jika wajah tidak terdeteksi)
+            distance (float): Jarak bahu (NaN jika tidak terdeteksi)
+            status (str): Teks status deteksi
         """
-        ret, frame = self.cap.read()
-        if not ret:
+        if self.cap is None:
             return
 
-        frame = cv2.resize(frame, (640, 480))
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-        face_result = self.face_mesh.process(rgb)
-        if face_result.multi_face_landmarks:
-            landmarks = face_result.multi_face_landmarks[0].landmark
-            draw_face_roi(frame, landmarks, FACE_REGIONS)
-            roi_rgb = [extract_face_roi_rgb(frame, landmarks, region) for region in FACE_REGIONS.values()]
-            avg_rgb = np.mean(roi_rgb, axis=0)
-            self.rgb_data.append(avg_rgb.tolist())
-            self.rppg_buffer.append(avg_rgb.tolist())
-            self.status_label.setText("Status: Wajah terdeteksi")
-        else:
-            self.rgb_data.append([np.nan, np.nan, np.nan])
-            self.rppg_buffer.append([np.nan, np.nan, np.nan])
-            self.status_label.setText("Status: Wajah tidak terdeteksi")
-
-        pose_result = self.pose.process(rgb)
-        if pose_result.pose_landmarks:
-            draw_shoulders(frame, pose_result.pose_landmarks.landmark)
-            distance = extract_shoulder_distance(pose_result.pose_landmarks.landmark, min_visibility=0.3)
-            if distance is not None:
-                self.resp_data.append(distance)
-                self.resp_buffer.append(distance)
-            else:
-                self.resp_data.append(np.nan)
-                self.resp_buffer.append(np.nan)
-                self.status_label.setText("Status: Bahu terdeteksi, tapi visibilitas rendah")
-        else:
-            self.resp_data.append(np.nan)
-            self.resp_buffer.append(np.nan)
-            self.status_label.setText("Status: Landmark pose tidak terdeteksi")
+        self.rgb_writer.write(avg_rgb)
+        self.resp_writer.write([distance])
+        self.push_rppg(avg_rgb)
+        self.push_resp(distance)
+        self.status_label.setText(status)
 
         qt_img = convert_cv_qt(frame)
         self.image_label.setPixmap(QPixmap.fromImage(qt_img))
 
     def analyze_signals(self):
         """
-        Menganalisis sinyal rPPG dan respirasi setiap beberapa detik.
-        Menghitung BPM dan BRPM serta memperbarui plot dan label GUI.
+        Mengambil salinan buffer sinyal setiap beberapa detik dan menjalankan
+        analisis BPM dan BRPM di thread pool agar GUI tidak tersendat.
         """
-        if len(self.rppg_buffer) < 60:
+        if self.rppg_count < 60 or self.analysis_busy:
             return
 
-        fps = 30
-        rgb = np.array(self.rppg_buffer).T
-        rgb = np.expand_dims(rgb, axis=0)
-        H = cpu_POS(rgb, fps)
-        pos_signal = H[0]
+        rgb = ring_snapshot(self.rppg_buf, self.rppg_idx, self.rppg_count)
+        resp = ring_snapshot(self.resp_buf, self.resp_idx, self.resp_count)
+        task = AnalyzeTask(rgb, resp, fps=30)
+        task.signals.finished.connect(self.on_analysis_done)
+        task.signals.failed.connect(self.on_analysis_failed)
+        self.analysis_busy = True
+        QThreadPool.globalInstance().start(task)
 
-        rppg_filtered = apply_bandpass_filter(pos_signal, 0.9, 2.4, fps)
-        bpm = estimate_bpm(rppg_filtered, fps)
+    def on_analysis_done(self, bpm, rppg_filtered, brpm, resp_filtered):
+        """
+        Memperbarui plot dan label GUI dengan hasil AnalyzeTask.
+        
+        Args:
+            bpm (float or None): Estimasi BPM
+            rppg_filtered (np.ndarray): Sinyal rPPG yang telah difilter
+            brpm (float or None): Estimasi BRPM
+            resp_filtered (np.ndarray or None): Sinyal respirasi yang telah difilter
+        """
+        self.analysis_busy = False
+        if self.cap is None:
+            return
 
-        self.plot_widget.clear()
-        self.plot_widget.plot(rppg_filtered[-150:], pen='g')
+        self.bpm_card.setToolTip("")
+        self.rppg_curve.setData(rppg_filtered[-150:])
         self.bpm_card.setText(f"BPM: {bpm:.2f}" if bpm else "BPM: -")
 
-        resp_array = np.array(self.resp_buffer)
-        if not np.isnan(resp_array).all():
-            resp_filtered = apply_bandpass_filter(resp_array, 0.1, 0.5, fps)
-            brpm = estimate_brpm(resp_filtered, fps)
-            self.plot_widget_resp.clear()
-            self.plot_widget_resp.plot(resp_filtered[-150:], pen='b')
+        if resp_filtered is not None:
+            self.resp_curve.setData(resp_filtered[-150:])
             self.brpm_card.setText(f"BRPM: {brpm:.2f}" if brpm else "BRPM: -")
         else:
             self.brpm_card.setText("BRPM: -")
 
+    def on_analysis_failed(self, message):
+        """
+        Menangani AnalyzeTask yang gagal: analisis berikutnya tetap dijadwalkan.
+
+        Args:
+            message (str): Pesan error dari AnalyzeTask
+        """
+        self.analysis_busy = False
+        if self.cap is None:
+            return
+
+        # Ditampilkan di kartu hasil (status_label ditimpa tiap frame); detail error di tooltip
+        self.bpm_card.setText("BPM: error")
+        self.bpm_card.setToolTip(f"Analisis gagal: {message}")
+        self.brpm_card.setText("BRPM: -")
+
+    def close_writers(self):
+        """
+        Menuntaskan dan menutup file CSV yang sedang ditulis (jika ada).
+        """
+        writers = [self.rgb_writer, self.resp_writer]
+        self.rgb_writer = self.resp_writer = None
+        error = None
+        for writer in writers:
+            if writer is None:
+                continue
+            try:
+                writer.close()
+            except Exception as e:
+                error = error or e
+        if error is not None:
+            raise error
+
     def stop_camera_and_save(self):
         """
-        Menghentikan kamera dan menyimpan data rPPG serta respirasi ke file CSV.
+        Menghentikan kamera dan menuntaskan penulisan data rPPG serta respirasi ke file CSV.
         Mereset tampilan dan status GUI setelah penyimpanan selesai.
         """
+        self.worker.stop()
         if self.cap:
             self.cap.release()
             self.cap = None
-        self.timer.stop()
         self.analysis_timer.stop()
         self.duration_timer.stop()
         self.duration_label.setText("Duration: 0 s")
         self.capture_start_time = None
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        rgb_filename = f"output/rppg_rgb_{timestamp}.csv"
-        resp_filename = f"output/resp_signal_{timestamp}.csv"
-
         try:
-            with open(rgb_filename, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(["R", "G", "B"])
-                writer.writerows(self.rgb_data)
-
-            with open(resp_filename, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(["Shoulder_Distance"])
-                for d in self.resp_data:
-                    writer.writerow([d])
-
+            self.close_writers()
             QMessageBox.information(self, "Success", "Data has been saved successfully.")
             self.status_label.setText("Status: Data saved.")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save data: {str(e)}")
             self.status_label.setText("Status: Error saving data.")
 
-        placeholder = QPixmap(640, 480)
-        placeholder.fill(Qt.black)
-        self.image_label.setPixmap(placeholder)
-        self.plot_widget.clear()
-        self.plot_widget_resp.clear()
+        self.image_label.setPixmap(self.placeholder)
+        self.rppg_curve.clear()
+        self.resp_curve.clear()
         self.bpm_card.setText("BPM: -")
         self.brpm_card.setText("BRPM: -")
         self.start_btn.setEnabled(True)
@@ -294,6 +509,11 @@ class VideoApp(QWidget):
         Args:
             event (QCloseEvent): Event penutupan jendela
         """
+        self.worker.stop()
         if self.cap:
             self.cap.release()
+        try:
+            self.close_writers()
+        except Exception:
+            pass
         event.accept()
@@ -1,5 +1,72 @@
 import numpy as np
-from scipy.signal import butter, filtfilt, find_peaks
+from functools import lru_cache
+from numba import njit
+from scipy.signal import butter, sosfiltfilt, find_peaks
+
+@njit('float32[:, ::1](float32[:, :, ::1], int64)', cache=True, fastmath=True)
+def _cpu_POS_core(X, w):
+    """
+    Inti algoritma POS dalam bentuk loop skalar yang dikompilasi Numba.
+    Signature eksplisit membuat kompilasi terjadi saat modul diimpor, bukan saat analisis pertama.
+    
+    Args:
+        X (np.ndarray): Sinyal RGB kontigu float32 dengan bentuk [estimator, 3, frame]
+        w (int): Panjang jendela (frame)
+        
+    Returns:
+        np.ndarray: Sinyal POS hasil overlap-add dengan bentuk [estimator, frame]
+    """
+    eps = 1e-9
+    e, c, f = X.shape
+    out = np.zeros((e, f), dtype=np.float32)
+    s1 = np.empty(w)
+    s2 = np.empty(w)
+    for i in range(e):
+        # Jumlah berjalan per kanal untuk frame 1..w-1, jendela pertama dimulai di frame 1
+        sR = 0.0
+        sG = 0.0
+        sB = 0.0
+        for k in range(1, w):
+            sR += X[i, 0, k]
+            sG += X[i, 1, k]
+            sB += X[i, 2, k]
+        for n in range(w, f):
+            m = n - w + 1
+            sR += X[i, 0, n]
+            sG += X[i, 1, n]
+            sB += X[i, 2, n]
+            mR = 1.0 / (sR / w + eps)
+            mG = 1.0 / (sG / w + eps)
+            mB = 1.0 / (sB / w + eps)
+
+            # Proyeksi P = [[0, 1, -1], [-2, 1, 1]] pada sinyal ternormalisasi
+            a1 = 0.0
+            a2 = 0.0
+            for k in range(w):
+                r = X[i, 0, m + k] * mR
+                g = X[i, 1, m + k] * mG
+                b = X[i, 2, m + k] * mB
+                s1[k] = g - b
+                s2[k] = -2.0 * r + g + b
+                a1 += s1[k]
+                a2 += s2[k]
+            a1 /= w
+            a2 /= w
+            v1 = 0.0
+            v2 = 0.0
+            for k in range(w):
+                v1 += (s1[k] - a1) * (s1[k] - a1)
+                v2 += (s2[k] - a2) * (s2[k] - a2)
+            alpha = np.sqrt(v1 / w) / (eps + np.sqrt(v2 / w))
+
+            mean_h = a1 + alpha * a2
+            for k in range(w):
+                out[i, m + k] += s1[k] + alpha * s2[k] - mean_h
+
+            sR -= X[i, 0, m]
+            sG -= X[i, 1, m]
+            sB -= X[i, 2, m]
+    return out
 
 def cpu_POS(signal, fps):
     """
@@ -12,34 +79,15 @@ def cpu_POS(signal, fps):
     Returns:
         np.ndarray: Sinyal rPPG hasil pemrosesan POS
     """
-    eps = 1e-9
-    X = signal  # shape: [estimators, 3, frames]
-    e, c, f = X.shape
+    X = np.ascontiguousarray(signal, dtype=np.float32)  # shape: [estimators, 3, frames]
     w = int(1.6 * fps)
-    P = np.array([[0, 1, -1], [-2, 1, 1]])
-    Q = np.stack([P for _ in range(e)], axis=0)
-    H = np.zeros((e, f))
-    for n in range(w, f):
-        m = n - w + 1
-        Cn = X[:, :, m:n+1]
-        M = 1.0 / (np.mean(Cn, axis=2) + eps)
-        M = np.expand_dims(M, axis=2)
-        Cn = np.multiply(M, Cn)
-        S = np.dot(Q, Cn)
-        S = S[0, :, :, :]
-        S = np.swapaxes(S, 0, 1)
-        S1 = S[:, 0, :]
-        S2 = S[:, 1, :]
-        alpha = np.std(S1, axis=1) / (eps + np.std(S2, axis=1))
-        alpha = np.expand_dims(alpha, axis=1)
-        Hn = np.add(S1, alpha * S2)
-        Hnm = Hn - np.expand_dims(np.mean(Hn, axis=1), axis=1)
-        H[:, m:n+1] = np.add(H[:, m:n+1], Hnm)
-    return H
+    return _cpu_POS_core(X, w)
 
+@lru_cache(maxsize=16)
 def butter_bandpass(lowcut, highcut, fs, order=3):
     """
     Membuat filter bandpass Butterworth untuk frekuensi tertentu.
+    Koefisien disimpan dalam cache karena parameter filter jarang berubah.
     
     Args:
         lowcut (float): Frekuensi batas bawah (Hz)
@@ -48,14 +96,14 @@ def butter_bandpass(lowcut, highcut, fs, order=3):
         order (int): Orde filter
         
     Returns:
-        tuple: Koefisien numerik dan denominatif dari filter
+        np.ndarray: Koefisien filter dalam bentuk second-order sections (SOS)
     """
     nyq = 0.5 * fs
     low = lowcut / nyq
     high = highcut / nyq
-    return butter(order, [low, high], btype='band')
+    return butter(order, [low, high], btype='band', output='sos')
 
-def apply_bandpass_filter(data, lowcut, highcut, fs):
+def apply_bandpass_filter(data, lowcut, highcut, fs, order=3):
     """
     Menerapkan filter bandpass pada sinyal menggunakan koefisien dari butter_bandpass.
     
@@ -64,12 +112,13 @@ def apply_bandpass_filter(data, lowcut, highcut, fs):
         lowcut (float): Frekuensi batas bawah (Hz)
         highcut (float): Frekuensi batas atas (Hz)
         fs (int): Frekuensi sampling (Hz)
+        order (int): Orde filter
         
     Returns:
         np.ndarray: Sinyal yang telah difilter
     """
-    b, a = butter_bandpass(lowcut, highcut, fs)
-    return filtfilt(b, a, data)
+    sos = butter_bandpass(lowcut, highcut, fs, order)
+    return sosfiltfilt(sos, data)
 
 def estimate_bpm(signal, fps, min_distance_sec=0.5):
     """
@@ -1,6 +1,10 @@
 # src/utils.py
 
 import numpy as np
+import csv
+import math
+import queue
+import threading
 from datetime import datetime
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 import cv2  
@@ -11,25 +15,26 @@ FACE_REGIONS = {
     "forehead": [10, 109, 338, 108, 107 , 9, 336, 337, 151]
 }
 
-def extract_face_roi_rgb(frame, landmarks, region_ids):
+# Indeks landmark dalam bentuk array agar bisa langsung dipakai untuk fancy indexing
+FACE_REGIONS_IDX = {name: np.asarray(ids, dtype=np.int32) for name, ids in FACE_REGIONS.items()}
+
+def landmarks_to_pixels(landmarks, w, h):
     """
-    Mengekstrak nilai rata-rata RGB dari wilayah tertentu di wajah berdasarkan landmark MediaPipe.
+    Mengonversi seluruh landmark MediaPipe menjadi koordinat piksel dalam satu operasi vektor.
     
     Args:
-        frame (np.ndarray): Gambar frame dari kamera
         landmarks (list): Daftar landmark wajah dari MediaPipe
-        region_ids (list): ID landmark yang merepresentasikan area tertentu
+        w (int): Lebar frame
+        h (int): Tinggi frame
     
     Returns:
-        np.ndarray: Nilai rata-rata R, G, B dari area tersebut
+        np.ndarray: Koordinat piksel (x, y) bertipe int32 dengan bentuk [N, 2]
     """
-    h, w, _ = frame.shape
-    pixels = []
-    for idx in region_ids:
-        x = int(landmarks[idx].x * w)
-        y = int(landmarks[idx].y * h)
-        pixels.append(frame[y, x])
-    return np.mean(pixels, axis=0)  # R, G, B average
+    lm = np.fromiter(
+        (v for p in landmarks for v in (p.x, p.y)),
+        dtype=np.float32, count=2 * len(landmarks)
+    ).reshape(-1, 2)
+    return (lm * np.array([w, h], dtype=np.float32)).astype(np.int32)
 
 def extract_shoulder_distance(landmarks, min_visibility=0.3):
     """
@@ -45,43 +50,44 @@ def extract_shoulder_distance(landmarks, min_visibility=0.3):
     left = landmarks[11]
     right = landmarks[12]
     if left.visibility > min_visibility and right.visibility > min_visibility:
-        left_xyz = np.array([left.x, left.y, left.z])
-        right_xyz = np.array([right.x, right.y, right.z])
-        return np.linalg.norm(left_xyz - right_xyz)
+        dx = left.x - right.x
+        dy = left.y - right.y
+        dz = left.z - right.z
+        return math.sqrt(dx * dx + dy * dy + dz * dz)
     return None
 
 
-def draw_face_roi(frame, landmarks, face_regions, alpha=0.4):
+def process_face(frame, lm_px, face_regions, alpha=0.4):
     """
-    Menggambar area ROI wajah pada frame video sebagai overlay transparan.
+    Mengekstrak rata-rata RGB tiap ROI wajah dan menggambar overlay ROI dalam satu lintasan.
+    Rata-rata dihitung dari frame asli sebelum overlay digabungkan.
     
     Args:
-        frame (np.ndarray): Frame video yang sedang diproses
-        landmarks (list): Landmark wajah dari MediaPipe
-        face_regions (dict): Wilayah ROI wajah dengan daftar ID landmark
+        frame (np.ndarray): Frame BGR yang sedang diproses
+        lm_px (np.ndarray): Koordinat piksel seluruh landmark (hasil landmarks_to_pixels)
+        face_regions (dict): Wilayah ROI wajah dengan array ID landmark (FACE_REGIONS_IDX)
         alpha (float): Transparansi overlay (0-1)
         
     Returns:
-        None: Fungsi ini mengubah frame secara langsung
+        list: Tuple rata-rata (R, G, B) untuk setiap wilayah
     """
-    h, w, _ = frame.shape
     overlay = frame.copy()
+    mask = np.zeros(frame.shape[:2], dtype=np.uint8)
     fill_color = (0, 255, 0)
     outline_color = (0, 100, 0)
+    roi_rgb = []
 
     for region_name, idxs in face_regions.items():
-        pts = []
-        for idx in idxs:
-            x = int(landmarks[idx].x * w)
-            y = int(landmarks[idx].y * h)
-            pts.append((x, y))
-        if len(pts) >= 3:
-            pts_array = np.array(pts, dtype=np.int32)
-            hull = cv2.convexHull(pts_array)
-            cv2.fillConvexPoly(overlay, hull, fill_color)
-            cv2.polylines(overlay, [hull], isClosed=True, color=outline_color, thickness=2)
+        hull = cv2.convexHull(lm_px[idxs])
+        mask[:] = 0
+        cv2.fillConvexPoly(mask, hull, 255)
+        b, g, r, _ = cv2.mean(frame, mask=mask)
+        roi_rgb.append((r, g, b))
+        cv2.fillConvexPoly(overlay, hull, fill_color)
+        cv2.polylines(overlay, [hull], isClosed=True, color=outline_color, thickness=2)
 
     cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+    return roi_rgb
 
 def draw_shoulders(frame, landmarks):
     """
@@ -99,4 +105,57 @@ def draw_shoulders(frame, landmarks):
         if landmarks[i].visibility > 0.5:
             x = int(landmarks[i].x * w)
             y = int(landmarks[i].y * h)
-            cv2.circle(frame, (x, y), 5, (0, 255, 0), -1)
\ No newline at end of file
+            cv2.circle(frame, (x, y), 5, (0, 255, 0), -1)
+
+class BufferedCsvWriter:
+    """
+    Penulis CSV asinkron: baris dimasukkan ke antrean dan ditulis oleh thread terpisah
+    ke file dengan buffer besar, sehingga data tersimpan bertahap selama pengambilan.
+    """
+    def __init__(self, path, header, buffer_size=1 << 20):
+        """
+        Args:
+            path (str): Lokasi file CSV
+            header (list): Nama kolom
+            buffer_size (int): Ukuran buffer file dalam byte
+        """
+        self.file = open(path, 'w', newline='', buffering=buffer_size)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(header)
+        self.queue = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def write(self, row):
+        """
+        Menambahkan satu baris ke antrean penulisan.
+        
+        Args:
+            row (list): Nilai-nilai kolom
+        """
+        self.queue.put(row)
+
+    def _drain(self):
+        while True:
+            row = self.queue.get()
+            if row is None:
+                break
+            if self.error is None:
+                try:
+                    self.writer.writerow(row)
+                except Exception as e:
+                    self.error = e
+
+    def close(self):
+        """
+        Menunggu seluruh antrean tertulis lalu menutup file.
+        
+        Raises:
+            Exception: Error pertama yang terjadi saat menulis baris
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+        if self.error is not None:
+            raise self.error
@@ -19,6 +19,8 @@ Date: November 2025
 import cv2
 import numpy as np
 import time
+import threading
+import queue
 from collections import deque
 
 # Core modules
@@ -70,7 +72,10 @@ class RPPGApplication:
         
         # Initialize components
         print("📸 Loading face detector...")
-        self.face_detector = FaceDetector()
+        self.face_detector = FaceDetector(
+            model_path=self.config.performance.face_landmarker_model,
+            use_gpu=self.config.performance.use_gpu_delegate
+        )
         
         print("🎯 Loading ROI selector...")
         self.roi_selector = ROISelector()
@@ -85,7 +90,8 @@ class RPPGApplication:
         self.bpm_estimator = BPMEstimator(
             fps=self.config.camera.target_fps,
             bpm_min=self.config.signal.bpm_min,
-            bpm_max=self.config.signal.bpm_max
+            bpm_max=self.config.signal.bpm_max,
+            window_size=self.config.signal.window_size_seconds
         )
         
         print("🖥️  Loading visualizer...")
@@ -106,8 +112,36 @@ class RPPGApplication:
         self.total_frames = 0
         self.successful_frames = 0
         
-        # Previous signal for motion detection
-        self.previous_signal = None
+        # Previous pulse signal for motion detection
+        self._prev_signal_buf = np.empty(
+            self.signal_processor.buffer_size, dtype=np.float32
+        )
+        self._prev_signal_len = 0
+        
+        # BPM is re-estimated every _bpm_stride frames (~10 Hz)
+        self._bpm_stride = max(1, self.config.camera.target_fps // 3)
+        self._frames_since_bpm = 0
+        
+        # Frame handoff between capture thread and processing loop.
+        # Capture writes slot _write_idx, the newest complete frame sits in
+        # _ready_idx, and processing reads _read_idx; indices are swapped
+        # under _frame_lock so no slot is written while it is being read.
+        h = self.config.camera.capture_height
+        w = self.config.camera.capture_width
+        self._frame_buf = [np.empty((h, w, 3), dtype=np.uint8) for _ in range(3)]
+        self._write_idx, self._ready_idx, self._read_idx = 0, 1, 2
+        self._frame_lock = threading.Lock()
+        self._frame_ready = threading.Event()
+        self._grab_thread = None
+        self._last_warn_t = 0.0
+        
+        # Face detection runs on its own thread; process_frame publishes
+        # the newest frame and uses whatever landmarks are ready.
+        self._det_queue = queue.Queue(maxsize=1)
+        self._det_lock = threading.Lock()
+        self._latest_landmarks = None
+        self._latest_landmarks_time = 0.0
+        self._det_thread = None
         
         print("\n✅ Application initialized successfully!")
         self._print_instructions()
@@ -146,7 +180,17 @@ class RPPGApplication:
         self.total_frames += 1
         
         # Step 1: Detect face
-        face_landmarks = self.face_detector.detect(frame)
+        if self._det_thread is None:
+            face_landmarks = self.face_detector.detect(self._detection_frame(frame))
+        else:
+            self._publish_for_detection(frame)
+            with self._det_lock:
+                face_landmarks = self._latest_landmarks
+                landmarks_time = self._latest_landmarks_time
+            
+            # Stale result (detector stalled or slowed): no usable face
+            if time.time() - landmarks_time > self.config.camera.max_landmark_age:
+                face_landmarks = None
         
         if face_landmarks is None:
             # No face detected
@@ -160,16 +204,18 @@ class RPPGApplication:
             )
         
         # Step 2: Extract ROIs
+        h, w = frame.shape[:2]
+        roi_polygons = self.face_detector.get_roi_polygons(face_landmarks, h, w)
         forehead, left_cheek, right_cheek = self.face_detector.extract_roi(
-            frame, face_landmarks
+            frame, face_landmarks, roi_polygons
         )
         
         # Step 3: Multi-ROI fusion
-        rois, weights = self.roi_selector.get_multi_roi_weights(
+        roi_signals, weights = self.roi_selector.get_multi_roi_signals(
             forehead, left_cheek, right_cheek
         )
         
-        if len(rois) == 0:
+        if len(roi_signals) == 0:
             # No valid ROIs
             return self.visualizer.update(
                 video_frame=frame,
@@ -184,10 +230,11 @@ class RPPGApplication:
         self.roi_quality = np.mean(weights)
         
         # Extract fused RGB signal
-        rgb_signal = SignalExtractor.extract_multi_roi_fusion(rois, weights)
+        rgb_signal = SignalExtractor.fuse_signals(roi_signals, weights)
         
-        # Draw ROI visualization
-        frame_annotated = self.face_detector.draw_face_mesh(frame, face_landmarks)
+        # Draw ROI visualization (in place; ROIs are already extracted)
+        self.face_detector.draw_roi_polygons(frame, roi_polygons)
+        frame_annotated = frame
         
         # Step 4: Add signal to processor
         self.signal_processor.add_signal(rgb_signal)
@@ -195,21 +242,26 @@ class RPPGApplication:
         # Check if we have enough data
         min_frames = self.config.camera.target_fps * self.config.signal.min_buffer_seconds
         
-        if len(self.signal_processor.red_buffer) >= min_frames:
+        if self.signal_processor.num_samples >= min_frames:
             self.successful_frames += 1
+            self._frames_since_bpm += 1
+        
+        if self._frames_since_bpm >= self._bpm_stride:
+            self._frames_since_bpm = 0
             
             # Extract pulse signal
             pulse_signal = self.signal_processor.extract_pulse_signal()
             
             if pulse_signal is not None:
-                # Compute signal quality
-                self.sqi = SignalQuality.compute_sqi(pulse_signal)
-                
-                # Detect motion
-                self.motion_detected = SignalQuality.assess_motion(
-                    pulse_signal, self.previous_signal
+                # Compute signal quality and detect motion against the
+                # previous chunk (stored in place for the next call)
+                n = len(pulse_signal)
+                self.sqi, self.motion_detected = SignalQuality.compute_sqi_and_motion(
+                    pulse_signal,
+                    self._prev_signal_buf[:n],
+                    self._prev_signal_len == n
                 )
-                self.previous_signal = pulse_signal.copy()
+                self._prev_signal_len = n
                 
                 # Estimate BPM
                 self.bpm, self.confidence = self.bpm_estimator.estimate(pulse_signal)
@@ -250,12 +302,19 @@ class RPPGApplication:
             print("   - Camera permissions are granted")
             return
         
-        # Configure camera
+        # Configure camera (pixel format before resolution, as V4L2 expects)
+        if self.config.camera.fourcc:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.config.camera.fourcc))
+            cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config.camera.capture_width)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config.camera.capture_height)
         cap.set(cv2.CAP_PROP_FPS, self.config.camera.target_fps)
         cap.set(cv2.CAP_PROP_BUFFERSIZE, self.config.camera.buffer_size)
         
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        fourcc_str = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4))
+        print(f"📷 Camera format: {fourcc_str}")
+        
         # Create window
         window_name = "rPPG Heart Rate Monitor"
         cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
@@ -269,12 +328,24 @@ class RPPGApplication:
         
         print("\n🎥 Camera started. Press Q to quit.\n")
         
+        # Start capture thread
+        self._frame_ready.clear()
+        self._grab_thread = threading.Thread(
+            target=self._grab_loop, args=(cap,), daemon=True
+        )
+        self._grab_thread.start()
+        
+        # Start detection thread
+        self._det_thread = threading.Thread(target=self._detect_loop, daemon=True)
+        self._det_thread.start()
+        
         try:
             while self.running:
-                ret, frame = cap.read()
+                frame = self._next_frame()
                 
-                if not ret:
-                    print("⚠️  Warning: Failed to read frame")
+                if frame is None:
+                    # No new frame yet; keep HighGUI responsive
+                    cv2.waitKey(1)
                     continue
                 
                 # Process frame
@@ -297,12 +368,123 @@ class RPPGApplication:
         finally:
             # Cleanup
             print("\n🛑 Shutting down...")
+            self.running = False
+            self._grab_thread.join()
+            self._det_thread.join()
+            self._det_thread = None
             cap.release()
             cv2.destroyAllWindows()
             
             # Print statistics
             self._print_statistics()
     
+    def _grab_loop(self, cap) -> None:
+        """
+        Capture thread: read frames into the write slot and publish them.
+        
+        Args:
+            cap: Opened cv2.VideoCapture
+        """
+        while self.running:
+            idx = self._write_idx
+            ret, frame = cap.read(self._frame_buf[idx])
+            
+            if not ret:
+                # Rate-limited: a failing camera returns immediately
+                now = time.monotonic()
+                if now - self._last_warn_t > 1.0:
+                    print("⚠️  Warning: Failed to read frame")
+                    self._last_warn_t = now
+                continue
+            
+            # read() reallocates if the camera ignored the requested size
+            self._frame_buf[idx] = frame
+            
+            with self._frame_lock:
+                self._write_idx, self._ready_idx = self._ready_idx, idx
+                self._frame_ready.set()
+    
+    def _next_frame(self, timeout: float = 0.1):
+        """
+        Take the newest captured frame for processing.
+        
+        The returned array stays valid until the next call.
+        
+        Args:
+            timeout: Seconds to wait for a new frame
+            
+        Returns:
+            BGR frame, or None if no new frame arrived within timeout
+        """
+        if not self._frame_ready.wait(timeout):
+            return None
+        
+        with self._frame_lock:
+            self._read_idx, self._ready_idx = self._ready_idx, self._read_idx
+            self._frame_ready.clear()
+            return self._frame_buf[self._read_idx]
+    
+    def _detection_frame(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Downscale a frame for face detection.
+        
+        Args:
+            frame: Input BGR frame from camera
+            
+        Returns:
+            New BGR array resized by camera.detection_scale
+        """
+        scale = self.config.camera.detection_scale
+        
+        if scale == 1.0:
+            return frame.copy()
+        
+        return cv2.resize(
+            frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+        )
+    
+    def _publish_for_detection(self, frame: np.ndarray) -> None:
+        """
+        Hand the newest frame to the detection thread, replacing any
+        frame it has not picked up yet.
+        
+        Args:
+            frame: Input BGR frame from camera
+        """
+        # Always a new array: the capture thread recycles the frame slot
+        item = (self._detection_frame(frame), time.time())
+        
+        try:
+            self._det_queue.get_nowait()
+        except queue.Empty:
+            pass
+        
+        try:
+            self._det_queue.put_nowait(item)
+        except queue.Full:
+            pass
+    
+    def _detect_loop(self) -> None:
+        """
+        Detection thread: run face mesh on the latest published frame.
+        """
+        while self.running:
+            try:
+                frame, timestamp = self._det_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            
+            # detect() returns a recycled internal buffer that this thread
+            # may overwrite while process_frame still reads the previous
+            # result, so publish a private copy
+            face_landmarks = self.face_detector.detect(frame)
+            if face_landmarks is not None:
+                face_landmarks = face_landmarks.copy()
+            
+            with self._det_lock:
+                self._latest_landmarks = face_landmarks
+                self._latest_landmarks_time = timestamp
+    
     def _print_statistics(self):
         """Print session statistics."""
         print("\n" + "=" * 70)
@@ -11,7 +11,7 @@ Date: November 2025
 """
 
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Optional, Tuple
 
 
 @dataclass
@@ -28,6 +28,18 @@ class CameraConfig:
     
     # Buffer size (prevents frame lag)
     buffer_size: int = 1
+    
+    # Pixel format requested from the camera (compressed MJPG cuts USB
+    # bandwidth vs. raw YUYV; empty string keeps the driver default)
+    fourcc: str = "MJPG"
+    
+    # Face detection runs on the frame resized by this factor; landmarks
+    # are normalized, so ROIs are still extracted at full resolution
+    detection_scale: float = 0.5
+    
+    # Landmarks from the detection thread older than this (seconds) are
+    # treated as no face, so ROIs are not cut from a stalled detector
+    max_landmark_age: float = 0.5
 
 
 @dataclass
@@ -111,6 +123,12 @@ class PerformanceConfig:
     # Graph display settings
     graph_history_points: int = 200
     
+    # Face landmark model: path to a MediaPipe face_landmarker.task enables
+    # the Tasks API (GPU delegate when use_gpu_delegate); None keeps the
+    # CPU-only Face Mesh solution
+    face_landmarker_model: Optional[str] = None
+    use_gpu_delegate: bool = True
+    
     # Consistency checking
     bpm_jump_threshold_large: int = 20
     bpm_jump_threshold_medium: int = 15
@@ -16,8 +16,168 @@ Date: November 2025
 
 import numpy as np
 from scipy import signal
+from scipy import fft as sfft
 from typing import Tuple, Optional
-from collections import deque
+from collections import OrderedDict
+from numba import njit
+
+
+@njit(cache=True, fastmath=True)
+def _fft_peak_kernel(
+    power: np.ndarray,
+    df: float,
+    freq_min: float,
+    freq_max: float
+) -> Tuple[bool, float, float]:
+    """
+    Compiled post-FFT stage of the FFT BPM estimator.
+    
+    Restricts the spectrum to [freq_min, freq_max] with integer bin bounds,
+    finds the peak, refines it with parabolic interpolation, and scores it
+    against the median noise floor with a harmonic check.
+    
+    Args:
+        power: Magnitude spectrum from rFFT
+        df: Frequency resolution (Hz per bin)
+        freq_min: Lower frequency bound (Hz)
+        freq_max: Upper frequency bound (Hz)
+        
+    Returns:
+        Tuple of (found, bpm, confidence)
+    """
+    lo = max(int(np.ceil(freq_min / df - 1e-9)), 0)
+    hi = min(int(np.floor(freq_max / df + 1e-9)), len(power) - 1)
+    
+    if hi < lo:
+        return False, 0.0, 0.0
+    
+    # Find peak
+    peak_idx = lo
+    peak_power = power[lo]
+    for k in range(lo + 1, hi + 1):
+        if power[k] > peak_power:
+            peak_power = power[k]
+            peak_idx = k
+    peak_freq = peak_idx * df
+    
+    # Parabolic interpolation for sub-bin resolution
+    if peak_idx > lo and peak_idx < hi:
+        alpha = power[peak_idx - 1]
+        beta = power[peak_idx]
+        gamma = power[peak_idx + 1]
+        p = 0.5 * (alpha - gamma) / (alpha - 2*beta + gamma + 1e-10)
+        peak_freq = peak_freq + p * df
+    
+    bpm = peak_freq * 60.0
+    
+    # Confidence from SNR
+    noise_floor = np.median(power[lo:hi + 1])
+    snr = peak_power / (noise_floor + 1e-10)
+    confidence = min(snr / 12.0, 1.0)
+    
+    # Boost if harmonic detected
+    harmonic_freq = peak_freq * 2
+    if harmonic_freq <= freq_max:
+        h_lo = max(int(np.ceil((harmonic_freq - 0.1) / df - 1e-9)), lo)
+        h_hi = min(int(np.floor((harmonic_freq + 0.1) / df + 1e-9)), hi)
+        if h_hi >= h_lo:
+            harmonic_power = power[h_lo]
+            for k in range(h_lo + 1, h_hi + 1):
+                if power[k] > harmonic_power:
+                    harmonic_power = power[k]
+            if harmonic_power > noise_floor * 2:
+                confidence *= 1.2
+    
+    confidence = min(confidence, 1.0)
+    
+    return True, bpm, confidence
+
+
+@njit(cache=True)
+def _find_pulse_peaks(
+    sig: np.ndarray,
+    min_distance: int,
+    prominence_threshold: float
+) -> np.ndarray:
+    """
+    Compiled equivalent of signal.find_peaks(sig, distance, prominence).
+    
+    Finds local maxima (plateaus resolved to their midpoint), drops peaks
+    closer than min_distance to a higher peak, then keeps peaks whose
+    prominence reaches prominence_threshold.
+    
+    Args:
+        sig: Filtered pulse signal
+        min_distance: Minimum spacing between peaks (samples, >= 1)
+        prominence_threshold: Minimum peak prominence
+        
+    Returns:
+        Peak indices (int32, ascending)
+    """
+    n = len(sig)
+    peaks = np.empty(n // 2 + 1, dtype=np.int32)
+    n_peaks = 0
+    
+    # Local maxima
+    i = 1
+    while i < n - 1:
+        if sig[i - 1] < sig[i]:
+            i_ahead = i + 1
+            while i_ahead < n - 1 and sig[i_ahead] == sig[i]:
+                i_ahead += 1
+            if sig[i_ahead] < sig[i]:
+                peaks[n_peaks] = (i + i_ahead - 1) // 2
+                n_peaks += 1
+                i = i_ahead
+        i += 1
+    
+    # Distance: higher peaks suppress close neighbours
+    keep = np.ones(n_peaks, dtype=np.bool_)
+    heights = np.empty(n_peaks, dtype=sig.dtype)
+    for j in range(n_peaks):
+        heights[j] = sig[peaks[j]]
+    order = np.argsort(heights, kind='mergesort')
+    for r in range(n_peaks - 1, -1, -1):
+        j = order[r]
+        if not keep[j]:
+            continue
+        k = j - 1
+        while k >= 0 and peaks[j] - peaks[k] < min_distance:
+            keep[k] = False
+            k -= 1
+        k = j + 1
+        while k < n_peaks and peaks[k] - peaks[j] < min_distance:
+            keep[k] = False
+            k += 1
+    
+    # Prominence: peak height above the higher of its two bases
+    out = np.empty(n_peaks, dtype=np.int32)
+    n_out = 0
+    for j in range(n_peaks):
+        if not keep[j]:
+            continue
+        p = peaks[j]
+        height = sig[p]
+        
+        left_min = height
+        k = p
+        while k >= 0 and sig[k] <= height:
+            if sig[k] < left_min:
+                left_min = sig[k]
+            k -= 1
+        
+        right_min = height
+        k = p
+        while k < n and sig[k] <= height:
+            if sig[k] < right_min:
+                right_min = sig[k]
+            k += 1
+        
+        if height - max(left_min, right_min) >= prominence_threshold:
+            out[n_out] = p
+            n_out += 1
+    
+    return out[:n_out]
 
 
 class BPMEstimator:
@@ -31,14 +191,15 @@ class BPMEstimator:
         fps: Frame rate (Hz)
         bpm_min: Minimum physiologically plausible BPM
         bpm_max: Maximum physiologically plausible BPM
-        bpm_history: Recent BPM estimates for consistency checking
+        bpm_history_size: Capacity of the BPM history ring buffer
     """
     
     def __init__(
         self,
         fps: int = 30,
         bpm_min: int = 45,
-        bpm_max: int = 150
+        bpm_max: int = 150,
+        window_size: int = 10
     ):
         """
         Initialize BPM estimator.
@@ -47,6 +208,7 @@ class BPMEstimator:
             fps: Signal sampling rate in Hz
             bpm_min: Minimum valid BPM (default 45)
             bpm_max: Maximum valid BPM (default 150)
+            window_size: Longest expected signal window in seconds (default 10)
         """
         self.fps = fps
         self.bpm_min = bpm_min
@@ -56,8 +218,18 @@ class BPMEstimator:
         self.freq_min = bpm_min / 60.0
         self.freq_max = bpm_max / 60.0
         
-        # BPM history for consistency checking
-        self.bpm_history = deque(maxlen=30)
+        # BPM history ring buffer for consistency checking
+        self.bpm_history_size = 30
+        self._bpm_ring = np.zeros(self.bpm_history_size)
+        self._bpm_head = 0
+        self._bpm_count = 0
+        
+        # Butterworth sections keyed on the band in 0.01 Hz steps (LRU)
+        self._filter_cache = OrderedDict()
+        self._filter_cache_size = 32
+        
+        # Per-frame scratch arrays, sized for the longest expected window
+        self._alloc_scratch(int(fps * window_size))
     
     def estimate(self, pulse_signal: np.ndarray) -> Tuple[Optional[float], float]:
         """
@@ -77,6 +249,12 @@ class BPMEstimator:
         if pulse_signal is None or len(pulse_signal) < self.fps * 3:
             return None, 0.0
         
+        # rPPG samples carry well under float32 precision; halve memory traffic
+        pulse_signal = np.ascontiguousarray(pulse_signal, dtype=np.float32)
+        
+        if len(pulse_signal) > self._N:
+            self._alloc_scratch(len(pulse_signal))
+        
         # Apply bandpass filter
         filtered_signal = self._bandpass_filter(pulse_signal)
         
@@ -124,10 +302,38 @@ class BPMEstimator:
         
         # Update history
         if final_confidence > 0.2:
-            self.bpm_history.append(bpm_final)
+            self._push_history(bpm_final)
         
         return bpm_final, final_confidence
     
+    def _alloc_scratch(self, n: int) -> None:
+        """
+        Allocate scratch arrays for signals of up to n samples.
+        
+        Args:
+            n: Maximum signal length in samples
+        """
+        self._N = n
+        m = 1 << (2 * n - 1).bit_length()
+        self._norm_buf = np.empty(n, dtype=np.float32)
+        self._power_buf = np.empty(n // 2 + 1, dtype=np.float32)
+        self._acf_power_buf = np.empty(m // 2 + 1, dtype=np.float32)
+        self._acf_tmp_buf = np.empty(m // 2 + 1, dtype=np.float32)
+        # Room for the default sosfiltfilt pad of the order-4 bandpass
+        # (4 sections -> padlen <= 27) on both sides
+        self._ext_buf = np.empty(n + 2 * 27, dtype=np.float32)
+    
+    def _push_history(self, bpm: float) -> None:
+        """
+        Append a BPM estimate to the history ring buffer.
+        
+        Args:
+            bpm: Accepted BPM estimate
+        """
+        self._bpm_ring[self._bpm_head] = bpm
+        self._bpm_head = (self._bpm_head + 1) % self.bpm_history_size
+        self._bpm_count = min(self._bpm_count + 1, self.bpm_history_size)
+    
     def _bandpass_filter(self, sig: np.ndarray) -> np.ndarray:
         """
         Apply adaptive bandpass filter.
@@ -141,8 +347,8 @@ class BPMEstimator:
             Bandpass filtered signal
         """
         # Adaptive frequency range based on history
-        if len(self.bpm_history) > 5:
-            median_bpm = np.median(list(self.bpm_history))
+        if self._bpm_count > 5:
+            median_bpm = np.median(self._bpm_ring[:self._bpm_count])
             # Narrow range around recent median
             freq_low = max(self.freq_min, (median_bpm - 20) / 60.0)
             freq_high = min(self.freq_max, (median_bpm + 20) / 60.0)
@@ -151,16 +357,72 @@ class BPMEstimator:
             freq_low = self.freq_min
             freq_high = self.freq_max
         
+        sos, zi, padlen = self._get_filter(freq_low, freq_high)
+        
+        # Zero-phase filtering as in signal.sosfiltfilt (odd extension,
+        # forward-backward passes), reusing the cached initial conditions.
+        # The odd extension is built in place in a persistent buffer.
+        n = len(sig)
+        if len(self._ext_buf) < n + 2 * padlen:
+            self._ext_buf = np.empty(n + 2 * padlen, dtype=np.float32)
+        x = self._ext_buf[:n + 2 * padlen]
+        x[padlen:padlen + n] = sig
+        np.subtract(2 * sig[0], sig[padlen:0:-1], out=x[:padlen])
+        np.subtract(2 * sig[-1], sig[-2:-padlen - 2:-1], out=x[padlen + n:])
+        
+        y, _ = signal.sosfilt(sos, x, zi=zi * x[0])
+        y = y[::-1]
+        y, _ = signal.sosfilt(sos, y, zi=zi * y[0])
+        filtered = y[::-1][padlen:-padlen]
+        
+        return filtered
+    
+    def _get_filter(
+        self,
+        freq_low: float,
+        freq_high: float
+    ) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Get Butterworth bandpass sections for a band, designing on cache miss.
+        
+        The adaptive band only moves when the BPM median shifts, so the band is
+        quantized to 0.01 Hz and designs are reused across frames.
+        
+        Args:
+            freq_low: Lower cutoff (Hz)
+            freq_high: Upper cutoff (Hz)
+            
+        Returns:
+            Tuple of (sos, zi, padlen): second-order sections, their
+            step-response initial conditions, and the odd-extension length
+        """
+        key = (int(round(freq_low * 100)), int(round(freq_high * 100)))
+        
+        entry = self._filter_cache.get(key)
+        if entry is not None:
+            self._filter_cache.move_to_end(key)
+            return entry
+        
         # Normalize frequencies
         nyquist = self.fps / 2.0
-        low_norm = freq_low / nyquist
-        high_norm = freq_high / nyquist
+        low_norm = key[0] / 100.0 / nyquist
+        high_norm = key[1] / 100.0 / nyquist
         
         # Butterworth bandpass filter (4th order)
-        b, a = signal.butter(4, [low_norm, high_norm], btype='band')
-        filtered = signal.filtfilt(b, a, sig)
+        sos = signal.butter(4, [low_norm, high_norm], btype='band', output='sos')
+        zi = signal.sosfilt_zi(sos).astype(np.float32)
         
-        return filtered
+        # Default sosfiltfilt pad length
+        n_zeros = min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum())
+        padlen = 3 * (2 * len(sos) + 1 - int(n_zeros))
+        sos = sos.astype(np.float32)
+        
+        entry = (sos, zi, padlen)
+        self._filter_cache[key] = entry
+        if len(self._filter_cache) > self._filter_cache_size:
+            self._filter_cache.popitem(last=False)
+        
+        return entry
     
     def _estimate_fft(self, sig: np.ndarray) -> Tuple[Optional[float], float]:
         """
@@ -176,56 +438,18 @@ class BPMEstimator:
             Tuple of (bpm, confidence)
         """
         # Compute FFT
-        fft_vals = np.fft.rfft(sig)
-        fft_freqs = np.fft.rfftfreq(len(sig), 1.0 / self.fps)
-        fft_power = np.abs(fft_vals)
+        # sig is shared with the other estimators, so it is not overwritten
+        spectrum = sfft.rfft(sig, workers=1)
+        fft_power = np.abs(spectrum, out=self._power_buf[:len(spectrum)])
+        df = self.fps / len(sig)
         
-        # Valid frequency range
-        valid_mask = (fft_freqs >= self.freq_min) & (fft_freqs <= self.freq_max)
-        valid_power = fft_power[valid_mask]
-        valid_freqs = fft_freqs[valid_mask]
+        found, bpm, confidence = _fft_peak_kernel(
+            fft_power, df, self.freq_min, self.freq_max
+        )
         
-        if len(valid_power) == 0:
+        if not found:
             return None, 0.0
         
-        # Find peak
-        peak_idx = np.argmax(valid_power)
-        peak_freq = valid_freqs[peak_idx]
-        peak_power = valid_power[peak_idx]
-        
-        # Parabolic interpolation for sub-bin resolution
-        if peak_idx > 0 and peak_idx < len(valid_power) - 1:
-            alpha = valid_power[peak_idx - 1]
-            beta = valid_power[peak_idx]
-            gamma = valid_power[peak_idx + 1]
-            
-            # Parabola vertex offset
-            p = 0.5 * (alpha - gamma) / (alpha - 2*beta + gamma + 1e-10)
-            
-            # Refined frequency
-            freq_step = valid_freqs[1] - valid_freqs[0]
-            peak_freq_refined = peak_freq + p * freq_step
-            peak_freq = peak_freq_refined
-        
-        # Convert to BPM
-        bpm = peak_freq * 60.0
-        
-        # Confidence from SNR
-        noise_floor = np.median(valid_power)
-        snr = peak_power / (noise_floor + 1e-10)
-        confidence = min(snr / 12.0, 1.0)
-        
-        # Boost if harmonic detected
-        harmonic_freq = peak_freq * 2
-        if harmonic_freq <= self.freq_max:
-            harmonic_mask = (valid_freqs >= harmonic_freq - 0.1) & (valid_freqs <= harmonic_freq + 0.1)
-            if np.any(harmonic_mask):
-                harmonic_power = np.max(valid_power[harmonic_mask])
-                if harmonic_power > noise_floor * 2:
-                    confidence *= 1.2
-        
-        confidence = min(confidence, 1.0)
-        
         return bpm, confidence
     
     def _estimate_autocorrelation(self, sig: np.ndarray) -> Tuple[Optional[float], float]:
@@ -242,11 +466,18 @@ class BPMEstimator:
             Tuple of (bpm, confidence)
         """
         # Normalize signal
-        sig_norm = (sig - np.mean(sig)) / (np.std(sig) + 1e-10)
-        
-        # Compute autocorrelation
-        autocorr = np.correlate(sig_norm, sig_norm, mode='full')
-        autocorr = autocorr[len(autocorr)//2:]  # Take positive lags only
+        n = len(sig)
+        sig_norm = np.subtract(sig, np.mean(sig), out=self._norm_buf[:n])
+        sig_norm /= np.std(sig) + 1e-10
+        
+        # Compute autocorrelation via Wiener-Khinchin (positive lags only),
+        # zero-padded to a power of two >= 2n-1 to avoid circular wrap-around
+        m = 1 << (2 * n - 1).bit_length()
+        k = m // 2 + 1
+        spectrum = sfft.rfft(sig_norm, m, overwrite_x=True, workers=1)
+        power = np.multiply(spectrum.real, spectrum.real, out=self._acf_power_buf[:k])
+        power += np.multiply(spectrum.imag, spectrum.imag, out=self._acf_tmp_buf[:k])
+        autocorr = sfft.irfft(power, m, overwrite_x=True, workers=1)[:n]
         
         # Valid lag range (in samples)
         min_lag = int(60.0 / self.bpm_max * self.fps)
@@ -289,12 +520,12 @@ class BPMEstimator:
         """
         # Find peaks
         # Distance constraint: minimum 60/bpm_max seconds between peaks
-        min_distance = int(60.0 / self.bpm_max * self.fps)
+        min_distance = max(int(60.0 / self.bpm_max * self.fps), 1)
         
-        peaks, properties = signal.find_peaks(
+        peaks = _find_pulse_peaks(
             sig,
-            distance=min_distance,
-            prominence=np.std(sig) * 0.3  # Adaptive threshold
+            min_distance,
+            np.std(sig) * 0.3  # Adaptive threshold
         )
         
         if len(peaks) < 3:
@@ -319,6 +550,34 @@ class BPMEstimator:
         
         return bpm, confidence
     
+    @staticmethod
+    def _median5(a: float, b: float, c: float, d: float, e: float) -> float:
+        """
+        Median of five values with a fixed comparison network.
+        
+        Args:
+            a, b, c, d, e: Input values
+            
+        Returns:
+            Median value
+        """
+        # Order pairs (a, b), (c, d) and put the smaller pair first; a is
+        # then below three others and cannot be the median
+        if b < a:
+            a, b = b, a
+        if d < c:
+            c, d = d, c
+        if c < a:
+            a, b, c, d = c, d, a, b
+        
+        # Replace a with e and repeat; the median is the smaller of the
+        # two remaining candidates
+        a, b = (e, b) if e < b else (b, e)
+        if c < a:
+            a, b, c, d = c, d, a, b
+        
+        return float(b if b < c else c)
+    
     def _check_consistency(self, bpm: float) -> float:
         """
         Check consistency with recent BPM history.
@@ -329,11 +588,20 @@ class BPMEstimator:
         Returns:
             Consistency score 0-1
         """
-        if len(self.bpm_history) < 5:
+        if self._bpm_count < 5:
             return 1.0  # No history yet
         
-        # Median of recent history
-        median_bpm = np.median(list(self.bpm_history)[-5:])
+        # Median of the 5 most recent entries
+        ring = self._bpm_ring
+        head = self._bpm_head
+        size = self.bpm_history_size
+        median_bpm = self._median5(
+            ring[(head - 1) % size],
+            ring[(head - 2) % size],
+            ring[(head - 3) % size],
+            ring[(head - 4) % size],
+            ring[(head - 5) % size]
+        )
         deviation = abs(bpm - median_bpm)
         
         # Penalize large jumps
@@ -17,9 +17,13 @@ Date: November 2025
 """
 
 import cv2
+import time
 import numpy as np
 import mediapipe as mp
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
+
+# ROI as (BGR patch, int32 polygon points in patch coordinates)
+ROI = Tuple[np.ndarray, np.ndarray]
 
 
 class FaceDetector:
@@ -28,34 +32,48 @@ class FaceDetector:
     
     Detects facial landmarks and extracts regions optimized for pulse signal
     measurement. Uses MediaPipe's real-time face mesh solution with 468 landmarks.
+    All ROI landmarks belong to the 468-point mesh, so iris refinement (an extra
+    model pass per frame) is off unless explicitly requested.
     
     Attributes:
         mp_face_mesh: MediaPipe Face Mesh solution
-        face_mesh: Configured Face Mesh instance
+        face_mesh: Configured Face Mesh instance (legacy solution API)
+        landmarker: Tasks API FaceLandmarker (when a model path is given)
         forehead_indices: Landmark indices for forehead ROI
         left_cheek_indices: Landmark indices for left cheek ROI
         right_cheek_indices: Landmark indices for right cheek ROI
     """
     
-    # ROI landmark mappings (optimized for PPG signal quality)
-    FOREHEAD_LANDMARKS = [
+    # Landmark count without iris refinement (refined / Tasks models add 10)
+    NUM_LANDMARKS = 468
+    
+    # ROI landmark mappings (optimized for PPG signal quality), stored as
+    # index arrays so they can gather from the landmark array directly
+    FOREHEAD_LANDMARKS = np.array([
         10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 
         361, 288, 397, 365, 379, 378, 400, 377, 152, 148, 
         176, 149, 150, 136, 172, 58, 132, 93, 234, 127
-    ]
+    ], dtype=np.intp)
     
-    LEFT_CHEEK_LANDMARKS = [
+    LEFT_CHEEK_LANDMARKS = np.array([
         205, 137, 123, 50, 203, 177, 147, 187, 207, 216
-    ]
+    ], dtype=np.intp)
     
-    RIGHT_CHEEK_LANDMARKS = [
+    RIGHT_CHEEK_LANDMARKS = np.array([
         425, 366, 426, 436, 416, 432, 422, 424, 418, 428
-    ]
+    ], dtype=np.intp)
+    
+    # ROI outline colors (BGR): forehead, left cheek, right cheek
+    ROI_COLORS = [(0, 255, 0), (255, 0, 0), (0, 0, 255)]
     
     def __init__(
         self, 
         min_detection_confidence: float = 0.5,
-        min_tracking_confidence: float = 0.5
+        min_tracking_confidence: float = 0.5,
+        max_detect_width: int = 640,
+        model_path: Optional[str] = None,
+        use_gpu: bool = True,
+        refine_landmarks: bool = False
     ):
         """
         Initialize MediaPipe Face Mesh detector.
@@ -63,131 +81,294 @@ class FaceDetector:
         Args:
             min_detection_confidence: Minimum confidence (0-1) for initial face detection
             min_tracking_confidence: Minimum confidence (0-1) for landmark tracking
+            max_detect_width: Wider frames are downscaled (aspect kept) before
+                detection; landmarks are normalized, so ROIs are unaffected
+            model_path: Path to a face_landmarker.task model. If given, the
+                MediaPipe Tasks FaceLandmarker is used instead of the legacy
+                CPU-only Face Mesh solution
+            use_gpu: Run the Tasks FaceLandmarker on the GPU delegate
+                (falls back to CPU if the delegate cannot be created)
+            refine_landmarks: Run the Face Mesh iris refinement model to get
+                10 extra iris landmarks (not needed for the ROIs)
         """
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            static_image_mode=False,  # Video mode for better temporal consistency
-            max_num_faces=1,           # Single person monitoring
-            refine_landmarks=True,     # Enable iris landmarks for better accuracy
-            min_detection_confidence=min_detection_confidence,
-            min_tracking_confidence=min_tracking_confidence
-        )
+        self.face_mesh = None
+        self.landmarker = None
+        
+        if model_path is not None:
+            self.landmarker = self._create_landmarker(
+                model_path, use_gpu,
+                min_detection_confidence, min_tracking_confidence
+            )
+            self._last_timestamp_ms = -1
+        else:
+            self.mp_face_mesh = mp.solutions.face_mesh
+            self.face_mesh = self.mp_face_mesh.FaceMesh(
+                static_image_mode=False,  # Video mode for better temporal consistency
+                max_num_faces=1,           # Single person monitoring
+                refine_landmarks=refine_landmarks,  # Iris model costs an extra pass
+                min_detection_confidence=min_detection_confidence,
+                min_tracking_confidence=min_tracking_confidence
+            )
+        
+        self.max_detect_width = max_detect_width
         
         # Store ROI landmark indices
         self.forehead_indices = self.FOREHEAD_LANDMARKS
         self.left_cheek_indices = self.LEFT_CHEEK_LANDMARKS
         self.right_cheek_indices = self.RIGHT_CHEEK_LANDMARKS
+        
+        # All ROI indices in one array, with split points per ROI, so the
+        # three polygons come from a single gather
+        self._roi_indices = np.concatenate((
+            self.forehead_indices, self.left_cheek_indices, self.right_cheek_indices
+        ))
+        self._roi_splits = np.cumsum([
+            len(self.forehead_indices), len(self.left_cheek_indices)
+        ])
+        
+        # Landmark coordinate buffers, alternated between detect() calls so
+        # the previous result stays valid while the next one is written
+        self._lm_bufs = [
+            np.empty((self.NUM_LANDMARKS, 3), dtype=np.float32) for _ in range(2)
+        ]
+        self._lm_idx = 0
+        
+        # Reused per-frame image buffers (allocated on first use / size change)
+        self._rgb_buf = None
+        self._canvas_buf = None
     
-    def detect(self, frame: np.ndarray) -> Optional[object]:
+    def detect(self, frame: np.ndarray) -> Optional[np.ndarray]:
         """
-        Detect face and extract 468 facial landmarks.
+        Detect face and extract facial landmarks.
+        
+        The returned array is an internal buffer that stays valid until the
+        second-next call to detect().
         
         Args:
             frame: Input BGR image from camera (H x W x 3)
             
         Returns:
-            Face mesh landmarks object or None if no face detected
+            Landmark array (N x 3, normalized x, y, z) or None if no face detected
         """
-        # Convert BGR to RGB (MediaPipe expects RGB)
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # Downscale large frames; FaceMesh resizes to a small tensor anyway
+        h, w = frame.shape[:2]
+        if w > self.max_detect_width:
+            scale = self.max_detect_width / w
+            frame = cv2.resize(
+                frame,
+                (self.max_detect_width, max(int(round(h * scale)), 1)),
+                interpolation=cv2.INTER_AREA
+            )
+        
+        # Convert BGR to RGB (MediaPipe expects RGB) into the reused buffer
+        if self._rgb_buf is None or self._rgb_buf.shape != frame.shape:
+            self._rgb_buf = np.empty_like(frame)
+        rgb_frame = self._rgb_buf
+        rgb_frame.flags.writeable = True
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb_frame)
+        
+        # Read-only input lets MediaPipe use the buffer without copying
+        rgb_frame.flags.writeable = False
         
         # Process frame
-        results = self.face_mesh.process(rgb_frame)
+        if self.landmarker is not None:
+            landmarks = self._detect_tasks(rgb_frame)
+        else:
+            results = self.face_mesh.process(rgb_frame)
+            landmarks = (
+                results.multi_face_landmarks[0].landmark
+                if results.multi_face_landmarks else None
+            )
         
         # Return first face if detected
-        if results.multi_face_landmarks:
-            return results.multi_face_landmarks[0]
+        if not landmarks:
+            return None
+        
+        n = len(landmarks)
+        
+        buf = self._lm_bufs[self._lm_idx]
+        if len(buf) != n:
+            buf = self._lm_bufs[self._lm_idx] = np.empty((n, 3), dtype=np.float32)
+        self._lm_idx ^= 1
+        
+        buf[:] = [(lm.x, lm.y, lm.z) for lm in landmarks]
+        
+        return buf
+    
+    @staticmethod
+    def _create_landmarker(
+        model_path: str,
+        use_gpu: bool,
+        min_detection_confidence: float,
+        min_tracking_confidence: float
+    ) -> object:
+        """
+        Create a MediaPipe Tasks FaceLandmarker in video mode.
         
-        return None
+        Args:
+            model_path: Path to face_landmarker.task
+            use_gpu: Try the GPU delegate first
+            min_detection_confidence: Minimum face detection confidence
+            min_tracking_confidence: Minimum tracking confidence
+            
+        Returns:
+            FaceLandmarker instance
+        """
+        from mediapipe.tasks import python as mp_tasks
+        from mediapipe.tasks.python import vision
+        
+        delegates = [mp_tasks.BaseOptions.Delegate.CPU]
+        if use_gpu:
+            delegates.insert(0, mp_tasks.BaseOptions.Delegate.GPU)
+        
+        for i, delegate in enumerate(delegates):
+            options = vision.FaceLandmarkerOptions(
+                base_options=mp_tasks.BaseOptions(
+                    model_asset_path=model_path,
+                    delegate=delegate
+                ),
+                running_mode=vision.RunningMode.VIDEO,
+                num_faces=1,
+                min_face_detection_confidence=min_detection_confidence,
+                min_tracking_confidence=min_tracking_confidence
+            )
+            try:
+                return vision.FaceLandmarker.create_from_options(options)
+            except RuntimeError:
+                # GPU delegate unavailable (no OpenGL ES context, etc.)
+                if i == len(delegates) - 1:
+                    raise
+    
+    def _detect_tasks(self, rgb_frame: np.ndarray) -> Optional[list]:
+        """
+        Run the Tasks FaceLandmarker on one RGB frame.
+        
+        Args:
+            rgb_frame: Input RGB image
+            
+        Returns:
+            Landmark list of the first face, or None if no face detected
+        """
+        # Video mode requires strictly increasing timestamps
+        timestamp_ms = max(int(time.monotonic() * 1000), self._last_timestamp_ms + 1)
+        self._last_timestamp_ms = timestamp_ms
+        
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        result = self.landmarker.detect_for_video(image, timestamp_ms)
+        
+        if not result.face_landmarks:
+            return None
+        
+        return result.face_landmarks[0]
     
     def extract_roi(
         self, 
         frame: np.ndarray, 
-        face_landmarks: object
-    ) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], Optional[np.ndarray]]:
+        face_landmarks: Optional[np.ndarray],
+        polygons: Optional[List[np.ndarray]] = None
+    ) -> Tuple[Optional[ROI], Optional[ROI], Optional[ROI]]:
         """
-        Extract three ROI masks from detected face landmarks.
+        Extract three ROIs from detected face landmarks.
         
-        Creates binary masks for forehead and both cheeks, then applies them
-        to the input frame to extract colored ROI regions.
+        Each ROI is the frame region under the polygon's bounding box plus the
+        polygon shifted into that box; no pixel mask is materialized.
         
         Args:
             frame: Input BGR image
-            face_landmarks: Face mesh landmarks from detect()
+            face_landmarks: Landmark array from detect()
+            polygons: ROI polygons from get_roi_polygons() (computed if None)
             
         Returns:
             Tuple of (forehead_roi, left_cheek_roi, right_cheek_roi)
-            Each ROI is a masked BGR image or None if extraction failed
+            Each ROI is a (patch, polygon) pair or None if extraction failed;
+            patch is a view into frame
         """
         if face_landmarks is None:
             return None, None, None
         
         h, w = frame.shape[:2]
         
-        # Extract each ROI with mask
-        forehead_roi = self._extract_region_mask(
-            frame, face_landmarks, self.forehead_indices, h, w
-        )
+        if polygons is None:
+            polygons = self.get_roi_polygons(face_landmarks, h, w)
         
-        left_cheek_roi = self._extract_region_mask(
-            frame, face_landmarks, self.left_cheek_indices, h, w
-        )
-        
-        right_cheek_roi = self._extract_region_mask(
-            frame, face_landmarks, self.right_cheek_indices, h, w
+        # Crop each ROI to its polygon
+        forehead_roi, left_cheek_roi, right_cheek_roi = (
+            self._extract_region(frame, points, h, w) for points in polygons
         )
         
         return forehead_roi, left_cheek_roi, right_cheek_roi
     
-    def _extract_region_mask(
+    def get_roi_polygons(
+        self,
+        face_landmarks: np.ndarray,
+        h: int,
+        w: int
+    ) -> List[np.ndarray]:
+        """
+        Convert landmarks to pixel polygons for the three ROIs.
+        
+        Computed once per frame and shared by extract_roi() and
+        draw_roi_polygons(). Each polygon is the convex hull of its
+        landmarks: the cheek landmark lists are not in contour order, and
+        the convex fill/rasterization downstream needs ordered vertices.
+        
+        Args:
+            face_landmarks: Landmark array from detect()
+            h: Frame height
+            w: Frame width
+            
+        Returns:
+            List of [forehead, left_cheek, right_cheek] int32 point arrays
+        """
+        points = self._landmark_points(face_landmarks, self._roi_indices, h, w)
+        
+        return [
+            cv2.convexHull(roi_points).reshape(-1, 2)
+            for roi_points in np.split(points, self._roi_splits)
+        ]
+    
+    def _extract_region(
         self, 
         frame: np.ndarray, 
-        face_landmarks: object, 
-        indices: list, 
+        points_array: np.ndarray, 
         h: int, 
         w: int
-    ) -> Optional[np.ndarray]:
+    ) -> Optional[ROI]:
         """
         Extract ROI region using convex hull of landmark points.
         
         Args:
             frame: Input BGR image
-            face_landmarks: Face mesh landmarks
-            indices: List of landmark indices defining the ROI
+            points_array: ROI polygon in pixel coordinates
             h: Frame height
             w: Frame width
             
         Returns:
-            Masked BGR image or None if insufficient landmarks
+            (patch, polygon) pair cropped to the polygon's bounding box
+            (clipped to the frame), or None if insufficient landmarks or
+            off-frame
         """
-        # Convert normalized coordinates to pixel coordinates
-        points = []
-        for idx in indices:
-            landmark = face_landmarks.landmark[idx]
-            x = int(landmark.x * w)
-            y = int(landmark.y * h)
-            points.append([x, y])
-        
         # Need at least 3 points for a polygon
-        if len(points) < 3:
+        if len(points_array) < 3:
             return None
         
-        # Create binary mask
-        mask = np.zeros((h, w), dtype=np.uint8)
-        points_array = np.array(points, dtype=np.int32)
+        # Bounding box clipped to the frame
+        x, y, bw, bh = cv2.boundingRect(points_array)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + bw, w), min(y + bh, h)
         
-        # Fill convex polygon
-        cv2.fillConvexPoly(mask, points_array, 255)
+        if x1 <= x0 or y1 <= y0:
+            return None
         
-        # Apply mask to frame
-        roi = cv2.bitwise_and(frame, frame, mask=mask)
+        # Polygon in patch coordinates
+        local_points = points_array - np.array([x0, y0], dtype=np.int32)
         
-        return roi
+        return frame[y0:y1, x0:x1], local_points
     
     def draw_face_mesh(
         self, 
         frame: np.ndarray, 
-        face_landmarks: object
+        face_landmarks: Optional[np.ndarray]
     ) -> np.ndarray:
         """
         Visualize ROI regions on frame for debugging and user feedback.
@@ -199,80 +380,73 @@ class FaceDetector:
         
         Args:
             frame: Input BGR image
-            face_landmarks: Face mesh landmarks
+            face_landmarks: Landmark array from detect()
             
         Returns:
-            Frame with ROI boundaries drawn
+            Frame with ROI boundaries drawn (an internal canvas, valid until
+            the next call)
         """
         if face_landmarks is None:
             return frame
         
         h, w = frame.shape[:2]
-        annotated_frame = frame.copy()
-        
-        # Draw each ROI with distinct color
-        self._draw_roi_boundary(
-            annotated_frame, face_landmarks, 
-            self.forehead_indices, h, w, 
-            color=(0, 255, 0),  # Green for forehead
-            thickness=2
-        )
-        
-        self._draw_roi_boundary(
-            annotated_frame, face_landmarks, 
-            self.left_cheek_indices, h, w, 
-            color=(255, 0, 0),  # Blue for left cheek
-            thickness=2
-        )
+        if self._canvas_buf is None or self._canvas_buf.shape != frame.shape:
+            self._canvas_buf = np.empty_like(frame)
+        annotated_frame = self._canvas_buf
+        np.copyto(annotated_frame, frame)
         
-        self._draw_roi_boundary(
-            annotated_frame, face_landmarks, 
-            self.right_cheek_indices, h, w, 
-            color=(0, 0, 255),  # Red for right cheek
-            thickness=2
+        self.draw_roi_polygons(
+            annotated_frame, self.get_roi_polygons(face_landmarks, h, w)
         )
         
         return annotated_frame
     
-    def _draw_roi_boundary(
-        self, 
-        frame: np.ndarray, 
-        face_landmarks: object, 
-        indices: list, 
-        h: int, 
-        w: int, 
-        color: Tuple[int, int, int],
+    def draw_roi_polygons(
+        self,
+        frame: np.ndarray,
+        polygons: List[np.ndarray],
         thickness: int = 2
     ) -> None:
         """
-        Draw polygon boundary for an ROI region.
+        Draw ROI boundaries in place (colors as in draw_face_mesh).
         
         Args:
             frame: Image to draw on (modified in-place)
-            face_landmarks: Face mesh landmarks
-            indices: Landmark indices defining the ROI
+            polygons: ROI polygons from get_roi_polygons()
+            thickness: Line thickness in pixels
+        """
+        for points, color in zip(polygons, self.ROI_COLORS):
+            if len(points) >= 3:
+                cv2.polylines(frame, [points], True, color, thickness)
+    
+    @staticmethod
+    def _landmark_points(
+        face_landmarks: np.ndarray,
+        indices: np.ndarray,
+        h: int,
+        w: int
+    ) -> np.ndarray:
+        """
+        Convert selected normalized landmarks to pixel coordinates.
+        
+        Args:
+            face_landmarks: Landmark array from detect()
+            indices: Landmark indices to convert
             h: Frame height
             w: Frame width
-            color: BGR color tuple
-            thickness: Line thickness in pixels
+            
+        Returns:
+            Array of (x, y) pixel coordinates (int32, truncated like int())
         """
-        # Convert landmarks to pixel coordinates
-        points = []
-        for idx in indices:
-            landmark = face_landmarks.landmark[idx]
-            x = int(landmark.x * w)
-            y = int(landmark.y * h)
-            points.append([x, y])
-        
-        # Draw closed polyline
-        if len(points) >= 3:
-            points_array = np.array(points, dtype=np.int32)
-            cv2.polylines(frame, [points_array], True, color, thickness)
+        points = face_landmarks[indices, :2] * np.array([w, h], dtype=np.float32)
+        return points.astype(np.int32)
     
     def __del__(self):
         """Cleanup MediaPipe resources on object destruction."""
-        if hasattr(self, 'face_mesh'):
+        if getattr(self, 'face_mesh', None) is not None:
             self.face_mesh.close()
+        if getattr(self, 'landmarker', None) is not None:
+            self.landmarker.close()
 
 
 if __name__ == "__main__":
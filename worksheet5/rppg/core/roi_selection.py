@@ -19,6 +19,11 @@ import cv2
 import numpy as np
 from typing import Tuple, Optional, List
 
+from core.signal_extraction import _polygon_bgr_stats
+
+# ROI as (BGR patch, int32 polygon points in patch coordinates)
+ROI = Tuple[np.ndarray, np.ndarray]
+
 
 class ROISelector:
     """
@@ -32,13 +37,16 @@ class ROISelector:
         weight_exposure: Weight for exposure quality (default 0.4)
         weight_saturation: Weight for saturation quality (default 0.3)
         weight_green: Weight for green channel prominence (default 0.3)
+        early_accept_threshold: Forehead quality at which select_best_roi
+            skips the cheeks (default 0.85)
     """
     
     def __init__(
         self,
         weight_exposure: float = 0.4,
         weight_saturation: float = 0.3,
-        weight_green: float = 0.3
+        weight_green: float = 0.3,
+        early_accept_threshold: float = 0.85
     ):
         """
         Initialize ROI selector with quality metric weights.
@@ -47,12 +55,15 @@ class ROISelector:
             weight_exposure: Weight for exposure assessment (0-1)
             weight_saturation: Weight for saturation assessment (0-1)
             weight_green: Weight for green prominence (0-1)
+            early_accept_threshold: Forehead quality (0-1) that is accepted
+                without assessing the cheeks in select_best_roi
         
         Note: Weights should sum to 1.0 for normalized quality scores
         """
         self.weight_exposure = weight_exposure
         self.weight_saturation = weight_saturation
         self.weight_green = weight_green
+        self.early_accept_threshold = early_accept_threshold
         
         # Quality thresholds
         self.exposure_min = 0.2
@@ -60,7 +71,11 @@ class ROISelector:
         self.saturation_min = 0.1
         self.green_ratio_min = 0.35
     
-    def assess_roi_quality(self, roi: np.ndarray) -> float:
+    def assess_roi_quality(
+        self,
+        roi: np.ndarray,
+        polygon: Optional[np.ndarray] = None
+    ) -> float:
         """
         Assess quality of a single ROI region.
         
@@ -70,24 +85,59 @@ class ROISelector:
           3. Green prominence: Relative green channel strength
         
         Args:
-            roi: ROI image in BGR format
+            roi: ROI image patch in BGR format
+            polygon: ROI polygon in patch coordinates (int32 N x 2); if None,
+                non-zero pixels of roi are taken as valid
             
         Returns:
             Quality score between 0.0 (poor) and 1.0 (excellent)
         """
-        if roi is None or roi.size == 0:
-            return 0.0
+        return self.analyze_roi(roi, polygon)[0]
+    
+    def analyze_roi(
+        self,
+        roi: np.ndarray,
+        polygon: Optional[np.ndarray] = None
+    ) -> Tuple[float, Optional[np.ndarray]]:
+        """
+        Assess ROI quality and extract its mean RGB signal together.
+        
+        Both come from one set of per-pixel sums, so each ROI pixel is read
+        once per frame (see assess_roi_quality for the metrics).
         
-        # Extract non-zero pixels (actual ROI region)
-        mask = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) > 0
-        if not np.any(mask):
-            return 0.0
+        Args:
+            roi: ROI image patch in BGR format
+            polygon: ROI polygon in patch coordinates (int32 N x 2); if None,
+                non-zero pixels of roi are taken as valid
+            
+        Returns:
+            Tuple of (quality 0-1, [R, G, B] mean or None if ROI is empty)
+        """
+        if roi is None or roi.size == 0:
+            return 0.0, None
         
-        # Convert to float for calculations
-        roi_float = roi.astype(np.float32) / 255.0
+        # Per-pixel sums over the valid region (0-255 scale)
+        if polygon is not None:
+            sum_b, sum_g, sum_r, sum_max, sum_min, count = _polygon_bgr_stats(
+                roi, np.ascontiguousarray(polygon, dtype=np.int32)
+            )
+            if count == 0:
+                return 0.0, None
+            b_mean = sum_b / count
+            g_mean = sum_g / count
+            r_mean = sum_r / count
+            max_mean = sum_max / count
+            min_mean = sum_min / count
+        else:
+            mask = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+            if cv2.countNonZero(mask) == 0:
+                return 0.0, None
+            b_mean, g_mean, r_mean, _ = cv2.mean(roi, mask=mask)
+            max_mean = cv2.mean(roi.max(axis=2), mask=mask)[0]
+            min_mean = cv2.mean(roi.min(axis=2), mask=mask)[0]
         
         # 1. Exposure quality (optimal range: 0.2 - 0.8)
-        mean_intensity = np.mean(roi_float[mask])
+        mean_intensity = (b_mean + g_mean + r_mean) / (3 * 255.0)
         
         if mean_intensity < self.exposure_min:
             # Underexposed
@@ -100,9 +150,11 @@ class ROISelector:
             exposure_quality = 1.0
         
         # 2. Saturation quality (higher is better, up to a point)
-        hsv = cv2.cvtColor(roi, cv2.COLOR_BGR2HSV)
-        saturation = hsv[:, :, 1][mask].astype(np.float32) / 255.0
-        mean_saturation = np.mean(saturation)
+        # HSV saturation (max - min) / max from the per-pixel max/min means
+        if max_mean > 0:
+            mean_saturation = (max_mean - min_mean) / max_mean
+        else:
+            mean_saturation = 0.0
         
         if mean_saturation < self.saturation_min:
             saturation_quality = mean_saturation / self.saturation_min
@@ -110,13 +162,10 @@ class ROISelector:
             saturation_quality = min(mean_saturation * 2.0, 1.0)
         
         # 3. Green channel prominence (green is PPG signal carrier)
-        b, g, r = cv2.split(roi_float)
-        
-        green_pixels = g[mask]
-        total_intensity = np.mean(roi_float[mask])
+        total_intensity = mean_intensity
         
         if total_intensity > 0:
-            green_ratio = np.mean(green_pixels) / total_intensity
+            green_ratio = g_mean / 255.0 / total_intensity
         else:
             green_ratio = 0.0
         
@@ -132,23 +181,25 @@ class ROISelector:
             self.weight_green * green_quality
         )
         
-        return total_quality
+        return total_quality, np.array([r_mean, g_mean, b_mean])
     
     def select_best_roi(
         self, 
-        forehead: Optional[np.ndarray],
-        left_cheek: Optional[np.ndarray],
-        right_cheek: Optional[np.ndarray]
-    ) -> Tuple[Optional[np.ndarray], float]:
+        forehead: Optional[ROI],
+        left_cheek: Optional[ROI],
+        right_cheek: Optional[ROI]
+    ) -> Tuple[Optional[ROI], float]:
         """
         Select the best single ROI from multiple options.
         
-        Evaluates all provided ROIs and returns the one with highest quality.
+        The forehead (primary ROI) is assessed first and returned right away
+        if its quality reaches early_accept_threshold; otherwise the cheeks
+        are assessed too and the highest quality ROI is returned.
         
         Args:
-            forehead: Forehead ROI image
-            left_cheek: Left cheek ROI image
-            right_cheek: Right cheek ROI image
+            forehead: Forehead (patch, polygon) pair
+            left_cheek: Left cheek (patch, polygon) pair
+            right_cheek: Right cheek (patch, polygon) pair
             
         Returns:
             Tuple of (best_roi, quality_score)
@@ -156,10 +207,19 @@ class ROISelector:
         best_roi = None
         best_quality = 0.0
         
-        # Evaluate each ROI
-        for roi in [forehead, left_cheek, right_cheek]:
+        # Primary ROI first: a good forehead wins in most frames
+        if forehead is not None:
+            quality = self.assess_roi_quality(*forehead)
+            if quality >= self.early_accept_threshold:
+                return forehead, quality
+            if quality > best_quality:
+                best_quality = quality
+                best_roi = forehead
+        
+        # Evaluate the cheeks
+        for roi in [left_cheek, right_cheek]:
             if roi is not None:
-                quality = self.assess_roi_quality(roi)
+                quality = self.assess_roi_quality(*roi)
                 if quality > best_quality:
                     best_quality = quality
                     best_roi = roi
@@ -168,10 +228,10 @@ class ROISelector:
     
     def get_multi_roi_weights(
         self,
-        forehead: Optional[np.ndarray],
-        left_cheek: Optional[np.ndarray],
-        right_cheek: Optional[np.ndarray]
-    ) -> Tuple[List[np.ndarray], List[float]]:
+        forehead: Optional[ROI],
+        left_cheek: Optional[ROI],
+        right_cheek: Optional[ROI]
+    ) -> Tuple[List[ROI], List[float]]:
         """
         Get weighted ROIs for multi-ROI fusion.
         
@@ -179,9 +239,9 @@ class ROISelector:
         for signal fusion.
         
         Args:
-            forehead: Forehead ROI image
-            left_cheek: Left cheek ROI image
-            right_cheek: Right cheek ROI image
+            forehead: Forehead (patch, polygon) pair
+            left_cheek: Left cheek (patch, polygon) pair
+            right_cheek: Right cheek (patch, polygon) pair
             
         Returns:
             Tuple of (rois, weights) where weights sum to 1.0
@@ -192,7 +252,7 @@ class ROISelector:
         # Collect valid ROIs and their qualities
         for roi in [forehead, left_cheek, right_cheek]:
             if roi is not None:
-                quality = self.assess_roi_quality(roi)
+                quality = self.assess_roi_quality(*roi)
                 if quality > 0.1:  # Minimum quality threshold
                     rois.append(roi)
                     qualities.append(quality)
@@ -205,6 +265,46 @@ class ROISelector:
         weights = [q / total_quality for q in qualities]
         
         return rois, weights
+    
+    def get_multi_roi_signals(
+        self,
+        forehead: Optional[ROI],
+        left_cheek: Optional[ROI],
+        right_cheek: Optional[ROI]
+    ) -> Tuple[List[np.ndarray], List[float]]:
+        """
+        Get per-ROI RGB signals with quality weights for fusion.
+        
+        Same selection as get_multi_roi_weights, but returns the RGB means
+        computed during quality assessment so the ROIs are not read again.
+        
+        Args:
+            forehead: Forehead (patch, polygon) pair
+            left_cheek: Left cheek (patch, polygon) pair
+            right_cheek: Right cheek (patch, polygon) pair
+            
+        Returns:
+            Tuple of (signals, weights) where weights sum to 1.0
+        """
+        signals = []
+        qualities = []
+        
+        # Collect valid ROIs and their qualities
+        for roi in [forehead, left_cheek, right_cheek]:
+            if roi is not None:
+                quality, signal = self.analyze_roi(*roi)
+                if quality > 0.1 and signal is not None:  # Minimum quality threshold
+                    signals.append(signal)
+                    qualities.append(quality)
+        
+        # Normalize weights
+        if len(qualities) == 0:
+            return [], []
+        
+        total_quality = sum(qualities)
+        weights = [q / total_quality for q in qualities]
+        
+        return signals, weights
 
 
 if __name__ == "__main__":
@@ -222,6 +322,7 @@ if __name__ == "__main__":
     print("  • Green prominence: PPG signal carrier strength")
     print("\nUsage Example:")
     print("  selector = ROISelector()")
-    print("  quality = selector.assess_roi_quality(roi)")
+    print("  quality = selector.assess_roi_quality(patch, polygon)")
     print("  best_roi, score = selector.select_best_roi(forehead, left, right)")
     print("  rois, weights = selector.get_multi_roi_weights(forehead, left, right)")
+    print("  signals, weights = selector.get_multi_roi_signals(forehead, left, right)")
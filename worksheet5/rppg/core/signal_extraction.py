@@ -11,9 +11,87 @@ Version: 2.1
 Date: November 2025
 """
 
+import math
 import cv2
 import numpy as np
 from typing import Optional, Tuple
+from numba import njit
+
+
+@njit(cache=True)
+def _polygon_bgr_stats(
+    image: np.ndarray,
+    points: np.ndarray
+) -> Tuple[int, int, int, int, int, int]:
+    """
+    Accumulate per-pixel color statistics inside a convex polygon.
+    
+    Scanline rasterization: for each row, the filled span runs between the
+    leftmost and rightmost edge crossings at the pixel centers. No mask is
+    allocated, and every pixel is read once for both the RGB signal and the
+    ROI quality metrics.
+    
+    Args:
+        image: BGR uint8 image
+        points: Polygon vertices (N x 2 int32, x/y in image coordinates)
+        
+    Returns:
+        Tuple of (sum_b, sum_g, sum_r, sum_max, sum_min, pixel_count), where
+        sum_max/sum_min accumulate max(B, G, R) and min(B, G, R) per pixel
+    """
+    h = image.shape[0]
+    w = image.shape[1]
+    n_pts = points.shape[0]
+    
+    y_min = points[0, 1]
+    y_max = points[0, 1]
+    for k in range(1, n_pts):
+        y_min = min(y_min, points[k, 1])
+        y_max = max(y_max, points[k, 1])
+    y_min = max(y_min, 0)
+    y_max = min(y_max, h - 1)
+    
+    sb = 0
+    sg = 0
+    sr = 0
+    s_max = 0
+    s_min = 0
+    n = 0
+    for y in range(y_min, y_max + 1):
+        # Span of this row from all edge crossings
+        x_left = np.inf
+        x_right = -np.inf
+        for k in range(n_pts):
+            x0 = points[k, 0]
+            y0 = points[k, 1]
+            x1 = points[(k + 1) % n_pts, 0]
+            y1 = points[(k + 1) % n_pts, 1]
+            if y0 == y1:
+                if y == y0:
+                    x_left = min(x_left, min(x0, x1))
+                    x_right = max(x_right, max(x0, x1))
+            elif min(y0, y1) <= y <= max(y0, y1):
+                x = x0 + (x1 - x0) * (y - y0) / (y1 - y0)
+                x_left = min(x_left, x)
+                x_right = max(x_right, x)
+        
+        if x_right < x_left:
+            continue
+        xl = max(int(np.ceil(x_left - 1e-9)), 0)
+        xr = min(int(np.floor(x_right + 1e-9)), w - 1)
+        
+        for x in range(xl, xr + 1):
+            b = image[y, x, 0]
+            g = image[y, x, 1]
+            r = image[y, x, 2]
+            sb += b
+            sg += g
+            sr += r
+            s_max += max(b, g, r)
+            s_min += min(b, g, r)
+        n += max(xr - xl + 1, 0)
+    
+    return sb, sg, sr, s_max, s_min, n
 
 
 class SignalExtractor:
@@ -25,16 +103,21 @@ class SignalExtractor:
     """
     
     @staticmethod
-    def extract_from_roi(roi: np.ndarray) -> Optional[np.ndarray]:
+    def extract_from_roi(
+        roi: np.ndarray,
+        polygon: Optional[np.ndarray] = None
+    ) -> Optional[np.ndarray]:
         """
         Extract mean RGB values from a single ROI.
         
-        Computes spatial average of R, G, B channels over the non-zero (valid)
-        pixels in the ROI mask. This reduces spatial noise and provides a
+        Computes spatial average of R, G, B channels over the valid pixels
+        of the ROI. This reduces spatial noise and provides a
         single-point signal for each color channel.
         
         Args:
-            roi: ROI image in BGR format (masked, non-ROI pixels are zero)
+            roi: ROI image patch in BGR format
+            polygon: ROI polygon in patch coordinates (int32 N x 2); if None,
+                non-zero pixels of roi are taken as valid
             
         Returns:
             Array [R, G, B] of mean values (0-255) or None if ROI is invalid
@@ -42,21 +125,24 @@ class SignalExtractor:
         if roi is None or roi.size == 0:
             return None
         
-        # Get binary mask of valid (non-zero) pixels
-        gray_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if len(roi.shape) == 3 else roi
-        mask = gray_roi > 0
+        # Polygon ROI: one compiled pass, no mask
+        if polygon is not None:
+            sum_b, sum_g, sum_r, _, _, count = _polygon_bgr_stats(
+                roi, np.ascontiguousarray(polygon, dtype=np.int32)
+            )
+            if count == 0:
+                return None
+            return np.array([sum_r, sum_g, sum_b]) / count
+        
+        # Valid (non-zero) pixels; cv2.mean treats any non-zero mask value as set
+        mask = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if len(roi.shape) == 3 else roi
         
         # No valid pixels
-        if not np.any(mask):
+        if cv2.countNonZero(mask) == 0:
             return None
         
-        # Split into B, G, R channels
-        b, g, r = cv2.split(roi)
-        
-        # Compute mean values over valid pixels
-        r_mean = np.mean(r[mask]) if np.any(mask) else 0.0
-        g_mean = np.mean(g[mask]) if np.any(mask) else 0.0
-        b_mean = np.mean(b[mask]) if np.any(mask) else 0.0
+        # Masked per-channel mean in one pass
+        b_mean, g_mean, r_mean, _ = cv2.mean(roi, mask=mask)
         
         return np.array([r_mean, g_mean, b_mean])
     
@@ -72,7 +158,7 @@ class SignalExtractor:
         improves robustness compared to single-ROI extraction.
         
         Args:
-            rois: List of ROI images
+            rois: List of (patch, polygon) ROI pairs
             weights: List of weights (should sum to 1.0)
             
         Returns:
@@ -85,32 +171,51 @@ class SignalExtractor:
             raise ValueError("Number of ROIs must match number of weights")
         
         # Extract signals from each ROI
-        signals = []
-        valid_weights = []
+        signals = [SignalExtractor.extract_from_roi(*roi) for roi in rois]
         
-        for roi, weight in zip(rois, weights):
-            signal = SignalExtractor.extract_from_roi(roi)
+        return SignalExtractor.fuse_signals(signals, weights)
+    
+    @staticmethod
+    def fuse_signals(
+        signals: list,
+        weights: list
+    ) -> Optional[np.ndarray]:
+        """
+        Weighted average of per-ROI RGB signals.
+        
+        Args:
+            signals: List of [R, G, B] arrays (None entries are skipped)
+            weights: List of weights, one per signal
+            
+        Returns:
+            Weighted average RGB signal or None if no valid signals
+        """
+        # Pack valid signals into a (K, 3) matrix
+        means = np.empty((len(signals), 3))
+        valid_weights = np.empty(len(signals))
+        k = 0
+        
+        for signal, weight in zip(signals, weights):
             if signal is not None:
-                signals.append(signal)
-                valid_weights.append(weight)
+                means[k] = signal
+                valid_weights[k] = weight
+                k += 1
         
         # No valid signals
-        if len(signals) == 0:
+        if k == 0:
             return None
         
         # Normalize weights
-        total_weight = sum(valid_weights)
-        if total_weight > 0:
-            valid_weights = [w / total_weight for w in valid_weights]
-        else:
+        total_weight = valid_weights[:k].sum()
+        if total_weight <= 0:
             return None
         
-        # Weighted fusion
-        fused_signal = np.zeros(3)
-        for signal, weight in zip(signals, valid_weights):
-            fused_signal += signal * weight
+        # Single ROI: the weighted average is the signal itself
+        if k == 1:
+            return means[0]
         
-        return fused_signal
+        # Weighted fusion
+        return valid_weights[:k] @ means[:k] / total_weight
     
     @staticmethod
     def validate_signal(signal: np.ndarray) -> bool:
@@ -123,7 +228,7 @@ class SignalExtractor:
           - Out-of-range values
         
         Args:
-            signal: RGB signal array
+            signal: RGB signal array ([R, G, B])
             
         Returns:
             True if signal is valid, False otherwise
@@ -131,16 +236,19 @@ class SignalExtractor:
         if signal is None:
             return False
         
+        # Scalar checks: cheaper than NumPy reductions on 3 elements
+        r, g, b = float(signal[0]), float(signal[1]), float(signal[2])
+        
         # Check for NaN or infinity
-        if not np.all(np.isfinite(signal)):
+        if not (math.isfinite(r) and math.isfinite(g) and math.isfinite(b)):
             return False
         
         # Check range (0-255 for 8-bit color)
-        if np.any(signal < 0) or np.any(signal > 255):
+        if r < 0 or g < 0 or b < 0 or r > 255 or g > 255 or b > 255:
             return False
         
         # Check for zero signal (suspicious)
-        if np.allclose(signal, 0):
+        if r <= 1e-8 and g <= 1e-8 and b <= 1e-8:
             return False
         
         return True
@@ -156,6 +264,7 @@ if __name__ == "__main__":
     print("  • Multi-ROI weighted fusion")
     print("  • Signal validation and quality checks")
     print("\nUsage Example:")
-    print("  signal = SignalExtractor.extract_from_roi(roi)")
+    print("  signal = SignalExtractor.extract_from_roi(patch, polygon)")
     print("  fused = SignalExtractor.extract_multi_roi_fusion(rois, weights)")
+    print("  fused = SignalExtractor.fuse_signals(signals, weights)")
     print("  valid = SignalExtractor.validate_signal(signal)")
@@ -17,9 +17,109 @@ Date: November 2025
 """
 
 import numpy as np
-from scipy import signal
-from collections import deque
-from typing import Optional
+from typing import Optional, Tuple
+from numba import njit
+
+
+@njit(cache=True, fastmath=True)
+def _pos_kernel(
+    X: np.ndarray,
+    C: np.ndarray,
+    poly_A: np.ndarray,
+    poly_pinv: np.ndarray,
+    kernel_size: int
+) -> np.ndarray:
+    """
+    Compiled POS pulse extraction on an interpolated RGB window.
+    
+    Normalizes each channel in place, projects onto the POS plane, combines
+    the two projections, removes the quadratic trend, and median filters the
+    result (zero-padded edges, like scipy.signal.medfilt).
+    
+    Args:
+        X: RGB window (3 x N float32, no NaN); overwritten with the
+            normalized signals
+        C: POS projection matrix (2 x 3)
+        poly_A: Quadratic trend basis (N x 3)
+        poly_pinv: Pseudoinverse of poly_A (3 x N)
+        kernel_size: Odd median filter length
+        
+    Returns:
+        Pulse signal (float32, length N)
+    """
+    n = X.shape[1]
+    
+    # Normalize signals (zero-mean, unit variance)
+    for c in range(3):
+        mean = 0.0
+        for i in range(n):
+            mean += X[c, i]
+        mean /= n
+        var = 0.0
+        for i in range(n):
+            d = X[c, i] - mean
+            var += d * d
+        std = np.sqrt(var / n)
+        scale = 1.0 / std if std >= 1e-8 else 1.0
+        for i in range(n):
+            X[c, i] = (X[c, i] - mean) * scale
+    
+    # Project signals onto the POS plane (2 x N)
+    S = np.empty((2, n), dtype=np.float32)
+    sum0 = 0.0
+    sum1 = 0.0
+    for i in range(n):
+        r = X[0, i]
+        g = X[1, i]
+        b = X[2, i]
+        S[0, i] = C[0, 0] * r + C[0, 1] * g + C[0, 2] * b
+        S[1, i] = C[1, 0] * r + C[1, 1] * g + C[1, 2] * b
+        sum0 += S[0, i]
+        sum1 += S[1, i]
+    
+    # alpha balances the two projections based on their standard deviations
+    mean0 = sum0 / n
+    mean1 = sum1 / n
+    var0 = 0.0
+    var1 = 0.0
+    for i in range(n):
+        d0 = S[0, i] - mean0
+        d1 = S[1, i] - mean1
+        var0 += d0 * d0
+        var1 += d1 * d1
+    alpha = np.sqrt(var0 / n) / (np.sqrt(var1 / n) + 1e-8)
+    
+    pulse = np.empty(n, dtype=np.float32)
+    for i in range(n):
+        pulse[i] = S[0, i] + alpha * S[1, i]
+    
+    # Remove quadratic polynomial trend (least squares via pseudoinverse)
+    c0 = 0.0
+    c1 = 0.0
+    c2 = 0.0
+    for i in range(n):
+        c0 += poly_pinv[0, i] * pulse[i]
+        c1 += poly_pinv[1, i] * pulse[i]
+        c2 += poly_pinv[2, i] * pulse[i]
+    for i in range(n):
+        pulse[i] -= poly_A[i, 0] * c0 + poly_A[i, 1] * c1 + poly_A[i, 2] * c2
+    
+    # Median filter (robust to outliers), insertion sort over the window
+    half = kernel_size // 2
+    window = np.empty(kernel_size, dtype=np.float32)
+    out = np.empty(n, dtype=np.float32)
+    for i in range(n):
+        for k in range(kernel_size):
+            j = i + k - half
+            v = pulse[j] if 0 <= j < n else 0.0
+            m = k
+            while m > 0 and window[m - 1] > v:
+                window[m] = window[m - 1]
+                m -= 1
+            window[m] = v
+        out[i] = window[half]
+    
+    return out
 
 
 class SignalProcessor:
@@ -34,9 +134,8 @@ class SignalProcessor:
         fps: Frame rate (Hz)
         window_size: Analysis window duration (seconds)
         buffer_size: Maximum buffer length (frames)
-        red_buffer: Red channel signal buffer
-        green_buffer: Green channel signal buffer
-        blue_buffer: Blue channel signal buffer
+        rgb_buffer: Ring buffer of [R, G, B] samples (3 x buffer_size, float32)
+        num_samples: Number of samples currently buffered
     """
     
     def __init__(self, fps: int = 30, window_size: int = 10):
@@ -51,10 +150,33 @@ class SignalProcessor:
         self.window_size = window_size
         self.buffer_size = fps * window_size
         
-        # RGB signal buffers (circular buffers)
-        self.red_buffer = deque(maxlen=self.buffer_size)
-        self.green_buffer = deque(maxlen=self.buffer_size)
-        self.blue_buffer = deque(maxlen=self.buffer_size)
+        # RGB signal ring buffer, one row per channel, and write cursor
+        self.rgb_buffer = np.full((3, self.buffer_size), np.nan, dtype=np.float32)
+        self._cursor = 0
+        self.num_samples = 0
+        
+        # Chronologically ordered copy of the buffer used for analysis
+        # (flat storage so the first N samples form a contiguous 3 x N matrix)
+        self._window = np.empty(3 * self.buffer_size, dtype=np.float32)
+        
+        # Sample index vector for NaN interpolation
+        self._idx = np.arange(self.buffer_size, dtype=np.float32)
+        
+        # POS projection matrix
+        # C = [[0, 1, -1], [-2, 1, 1]]
+        # This projects RGB onto plane orthogonal to skin tone vector
+        self._C = np.array([[0, 1, -1], [-2, 1, 1]], dtype=np.float32)
+        
+        # Quadratic detrending basis and its pseudoinverse for the last
+        # window length (rebuilt only while the buffer is filling)
+        self._poly_n = 0
+        self._poly_A = None
+        self._poly_pinv = None
+        
+        # Median filter kernel size: ~0.1 seconds, odd
+        self._kernel_size = max(3, int(self.fps * 0.1))
+        if self._kernel_size % 2 == 0:
+            self._kernel_size += 1
     
     def add_signal(self, rgb_signal: np.ndarray) -> None:
         """
@@ -65,11 +187,11 @@ class SignalProcessor:
         """
         if rgb_signal is None or len(rgb_signal) != 3:
             # Add NaN for missing frames (will be interpolated)
-            rgb_signal = np.array([np.nan, np.nan, np.nan])
+            rgb_signal = np.nan
         
-        self.red_buffer.append(rgb_signal[0])
-        self.green_buffer.append(rgb_signal[1])
-        self.blue_buffer.append(rgb_signal[2])
+        self.rgb_buffer[:, self._cursor] = rgb_signal
+        self._cursor = (self._cursor + 1) % self.buffer_size
+        self.num_samples = min(self.num_samples + 1, self.buffer_size)
     
     def extract_pulse_signal(self) -> Optional[np.ndarray]:
         """
@@ -82,80 +204,42 @@ class SignalProcessor:
         4. Apply advanced detrending and filtering
         
         Returns:
-            Pulse signal array or None if insufficient data
+            Pulse signal array (float32) or None if insufficient data
         """
         # Need minimum 3 seconds of data
         min_length = self.fps * 3
-        if len(self.red_buffer) < min_length:
+        n = self.num_samples
+        if n < min_length:
             return None
         
-        # Convert buffers to numpy arrays
-        red = np.array(list(self.red_buffer))
-        green = np.array(list(self.green_buffer))
-        blue = np.array(list(self.blue_buffer))
-        
-        # Interpolate missing values (NaN)
-        red = self._interpolate_nans(red)
-        green = self._interpolate_nans(green)
-        blue = self._interpolate_nans(blue)
-        
-        # Normalize signals (zero-mean, unit variance)
-        red_norm = self._normalize_signal(red)
-        green_norm = self._normalize_signal(green)
-        blue_norm = self._normalize_signal(blue)
-        
-        # Stack into matrix [R, G, B] x N
-        X = np.vstack([red_norm, green_norm, blue_norm])
-        
-        # POS projection matrix
-        # C = [[0, 1, -1], [-2, 1, 1]]
-        # This projects RGB onto plane orthogonal to skin tone vector
-        C = np.array([[0, 1, -1], [-2, 1, 1]], dtype=np.float32)
+        # Matrix [R, G, B] x N in chronological order (oldest sample first)
+        X = self._window[:3 * n].reshape(3, n)
+        if n < self.buffer_size:
+            np.copyto(X, self.rgb_buffer[:, :n])
+        else:
+            cur = self._cursor
+            np.concatenate(
+                (self.rgb_buffer[:, cur:], self.rgb_buffer[:, :cur]), axis=1, out=X
+            )
         
-        # Project signals
-        S = np.dot(C, X)  # Shape: (2, N)
+        # Interpolate missing values (NaN), in place; one NaN scan for all rows
+        for c in np.flatnonzero(np.isnan(X).any(axis=1)):
+            self._interpolate_nans(X[c])
         
-        # Combine projections with adaptive weighting
-        # alpha balances the two projections based on their standard deviations
-        std_s0 = np.std(S[0, :])
-        std_s1 = np.std(S[1, :])
-        alpha = std_s0 / (std_s1 + 1e-8)
+        # Normalize, project, combine, detrend and smooth in one compiled pass
+        poly_A, poly_pinv = self._detrend_basis(n)
         
-        pulse_signal = S[0, :] + alpha * S[1, :]
-        
-        # Advanced preprocessing
-        pulse_signal = self._advanced_detrending(pulse_signal)
-        pulse_signal = self._temporal_smoothing(pulse_signal)
-        
-        return pulse_signal
-    
-    def _normalize_signal(self, sig: np.ndarray) -> np.ndarray:
-        """
-        Normalize signal to zero-mean and unit variance.
-        
-        Args:
-            sig: Input signal
-            
-        Returns:
-            Normalized signal
-        """
-        mean = np.mean(sig)
-        std = np.std(sig)
-        
-        if std < 1e-8:
-            return sig - mean
-        
-        return (sig - mean) / std
+        return _pos_kernel(X, self._C, poly_A, poly_pinv, self._kernel_size)
     
     def _interpolate_nans(self, sig: np.ndarray) -> np.ndarray:
         """
-        Linearly interpolate NaN values in signal.
+        Linearly interpolate NaN values in signal (in place).
         
         Args:
             sig: Signal array possibly containing NaN
             
         Returns:
-            Signal with NaN values interpolated
+            Signal with NaN values interpolated (same array as sig)
         """
         nans = np.isnan(sig)
         
@@ -163,72 +247,49 @@ class SignalProcessor:
             return sig
         
         # Get valid indices
-        x = np.arange(len(sig))
+        x = self._idx[:len(sig)]
         valid_mask = ~nans
         
         if not np.any(valid_mask):
             # All NaN - return zeros
-            return np.zeros_like(sig)
+            sig.fill(0)
+            return sig
         
         # Linear interpolation
         sig[nans] = np.interp(x[nans], x[valid_mask], sig[valid_mask])
         
         return sig
     
-    def _advanced_detrending(self, sig: np.ndarray) -> np.ndarray:
+    def _detrend_basis(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Remove polynomial and linear trends from signal.
+        Quadratic detrending basis [1, x, x^2] and its pseudoinverse.
         
-        Eliminates slow drifts and baseline wander that can interfere
-        with pulse detection.
+        Removing the least-squares quadratic fit eliminates slow drifts and
+        baseline wander that can interfere with pulse detection; the
+        residual is orthogonal to the linear terms as well, so no separate
+        linear detrending pass is needed. Cached for the last window length.
         
         Args:
-            sig: Input pulse signal
+            n: Window length (samples)
             
         Returns:
-            Detrended signal
+            Tuple of (basis N x 3, pseudoinverse 3 x N)
         """
-        # Remove quadratic polynomial trend
-        x = np.arange(len(sig))
-        coeffs = np.polyfit(x, sig, deg=2)
-        poly_trend = np.polyval(coeffs, x)
-        sig_detrended = sig - poly_trend
-        
-        # Additional linear detrending
-        sig_detrended = signal.detrend(sig_detrended, type='linear')
-        
-        return sig_detrended
-    
-    def _temporal_smoothing(self, sig: np.ndarray) -> np.ndarray:
-        """
-        Apply median filtering for temporal smoothing.
-        
-        Reduces high-frequency noise and impulse artifacts while
-        preserving pulse shape.
-        
-        Args:
-            sig: Input signal
-            
-        Returns:
-            Smoothed signal
-        """
-        # Kernel size: ~0.1 seconds
-        kernel_size = max(3, int(self.fps * 0.1))
-        
-        # Must be odd
-        if kernel_size % 2 == 0:
-            kernel_size += 1
-        
-        # Median filter (robust to outliers)
-        smoothed = signal.medfilt(sig, kernel_size=kernel_size)
-        
-        return smoothed
+        if n != self._poly_n:
+            # x scaled to [-1, 1] keeps the basis well conditioned
+            x = np.linspace(-1.0, 1.0, n)
+            A = np.stack([np.ones_like(x), x, x * x], axis=1)
+            self._poly_A = A.astype(np.float32)
+            self._poly_pinv = np.linalg.pinv(A).astype(np.float32)
+            self._poly_n = n
+        
+        return self._poly_A, self._poly_pinv
     
     def reset(self) -> None:
         """Clear all signal buffers."""
-        self.red_buffer.clear()
-        self.green_buffer.clear()
-        self.blue_buffer.clear()
+        self.rgb_buffer.fill(np.nan)
+        self._cursor = 0
+        self.num_samples = 0
 
 
 if __name__ == "__main__":
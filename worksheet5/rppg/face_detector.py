@@ -13,34 +13,58 @@ class FaceDetector:
     Detect face dan extract ROI menggunakan MediaPipe Face Mesh.
     """
     
-    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+    def __init__(self, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                 detection_scale=0.5):
         """
         Initialize MediaPipe Face Mesh.
         
         Args:
             min_detection_confidence: Minimum confidence untuk deteksi wajah
             min_tracking_confidence: Minimum confidence untuk tracking
+            detection_scale: Skala frame untuk face mesh (landmarks ternormalisasi,
+                             jadi ROI tetap diambil dari frame resolusi penuh)
         """
+        self.detection_scale = detection_scale
+        
         self.mp_face_mesh = mp.solutions.face_mesh
         self.face_mesh = self.mp_face_mesh.FaceMesh(
             static_image_mode=False,
             max_num_faces=1,
-            refine_landmarks=True,
+            refine_landmarks=False,  # Iris tidak dipakai ROI; hemat satu inferensi model
             min_detection_confidence=min_detection_confidence,
             min_tracking_confidence=min_tracking_confidence
         )
         
         # Landmark indices untuk ROI
         # Forehead: region atas wajah
-        self.forehead_indices = [10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 
-                                  361, 288, 397, 365, 379, 378, 400, 377, 152, 148, 
-                                  176, 149, 150, 136, 172, 58, 132, 93, 234, 127]
+        self.forehead_indices = np.array([10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 
+                                          361, 288, 397, 365, 379, 378, 400, 377, 152, 148, 
+                                          176, 149, 150, 136, 172, 58, 132, 93, 234, 127],
+                                         dtype=np.intp)
         
         # Left cheek (kiri dari perspektif wajah, kanan dari perspektif kamera)
-        self.left_cheek_indices = [205, 137, 123, 50, 203, 177, 147, 187, 207, 216]
+        self.left_cheek_indices = np.array([205, 137, 123, 50, 203, 177, 147, 187, 207, 216],
+                                           dtype=np.intp)
         
         # Right cheek (kanan dari perspektif wajah, kiri dari perspektif kamera)
-        self.right_cheek_indices = [425, 266, 426, 436, 416, 432, 422, 424, 418, 428]
+        self.right_cheek_indices = np.array([425, 266, 426, 436, 416, 432, 422, 424, 418, 428],
+                                            dtype=np.intp)
+        
+        # Semua indeks ROI dalam satu array (plus titik split per ROI), supaya
+        # koordinat ketiga ROI didapat dengan satu gather per frame
+        self._roi_indices = np.concatenate(
+            [self.forehead_indices, self.left_cheek_indices, self.right_cheek_indices]
+        ).tolist()
+        self._roi_splits = np.cumsum([len(self.forehead_indices), len(self.left_cheek_indices)])
+        
+        # Cache titik ROI untuk landmarks terakhir (dipakai extract_roi dan draw_face_mesh)
+        self._points_landmarks = None
+        self._points_shape = None
+        self._points_cache = None
+        
+        # Buffer persisten untuk mask dan frame RGB (hindari alokasi per frame)
+        self._mask_buf = None
+        self._rgb_buf = None
     
     def detect(self, frame):
         """
@@ -52,8 +76,20 @@ class FaceDetector:
         Returns:
             face_mesh results atau None jika tidak ada wajah terdeteksi
         """
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # Downsample dulu: biaya face mesh sebanding jumlah pixel
+        if self.detection_scale != 1.0:
+            frame = cv2.resize(frame, (0, 0), fx=self.detection_scale, fy=self.detection_scale,
+                               interpolation=cv2.INTER_AREA)
+        
+        # Convert BGR to RGB (ke buffer yang di-reuse)
+        if self._rgb_buf is None or self._rgb_buf.shape != frame.shape:
+            self._rgb_buf = np.empty_like(frame)
+        rgb_frame = self._rgb_buf
+        rgb_frame.flags.writeable = True
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb_frame)
+        
+        # Read-only supaya MediaPipe memakai buffer tanpa copy
+        rgb_frame.flags.writeable = False
         
         # Process
         results = self.face_mesh.process(rgb_frame)
@@ -62,101 +98,206 @@ class FaceDetector:
             return results.multi_face_landmarks[0]  # Ambil wajah pertama
         return None
     
-    def extract_roi(self, frame, face_landmarks):
+    def extract_roi(self, frame, face_landmarks, return_masks=False):
         """
         Extract ROI (Region of Interest) untuk rPPG dari face landmarks.
         
         Args:
             frame: Input BGR image
             face_landmarks: Face mesh landmarks dari detect()
+            return_masks: Jika True, kembalikan juga mask polygon tiap ROI
+                (supaya quality/signal tidak perlu menurunkan mask lagi)
             
         Returns:
             Tuple of (forehead_roi, left_cheek_roi, right_cheek_roi)
-            Masing-masing berupa mask atau None jika gagal
+            Masing-masing berupa potongan bounding box ROI (pixel di luar
+            polygon bernilai 0) atau None jika gagal.
+            Jika return_masks=True: tuple (rois, masks), masks berurutan sama
         """
         if face_landmarks is None:
-            return None, None, None
+            rois = (None, None, None)
+            return (rois, (None, None, None)) if return_masks else rois
         
         h, w = frame.shape[:2]
         
+        forehead_points, left_cheek_points, right_cheek_points = self._roi_points(face_landmarks, h, w)
+        
         # Extract forehead ROI
-        forehead_roi = self._extract_region_mask(frame, face_landmarks, self.forehead_indices, h, w)
+        forehead_roi, forehead_mask = self._extract_region_mask(frame, forehead_points, h, w)
         
         # Extract cheek ROIs
-        left_cheek_roi = self._extract_region_mask(frame, face_landmarks, self.left_cheek_indices, h, w)
-        right_cheek_roi = self._extract_region_mask(frame, face_landmarks, self.right_cheek_indices, h, w)
+        left_cheek_roi, left_cheek_mask = self._extract_region_mask(frame, left_cheek_points, h, w)
+        right_cheek_roi, right_cheek_mask = self._extract_region_mask(frame, right_cheek_points, h, w)
         
-        return forehead_roi, left_cheek_roi, right_cheek_roi
+        rois = (forehead_roi, left_cheek_roi, right_cheek_roi)
+        if return_masks:
+            return rois, (forehead_mask, left_cheek_mask, right_cheek_mask)
+        return rois
     
-    def _extract_region_mask(self, frame, face_landmarks, indices, h, w):
+    def extract_roi_means(self, frame, face_landmarks):
+        """
+        Extract mean RGB tiap ROI langsung dari frame (tanpa membuat gambar ROI).
+        
+        Args:
+            frame: Input BGR image
+            face_landmarks: Face mesh landmarks dari detect()
+            
+        Returns:
+            Tuple of (forehead_rgb, left_cheek_rgb, right_cheek_rgb)
+            Masing-masing berupa numpy array [R, G, B] atau None jika gagal
+        """
+        if face_landmarks is None:
+            return None, None, None
+        
+        h, w = frame.shape[:2]
+        
+        forehead_points, left_cheek_points, right_cheek_points = self._roi_points(face_landmarks, h, w)
+        
+        return (self._extract_region_mean(frame, forehead_points, h, w),
+                self._extract_region_mean(frame, left_cheek_points, h, w),
+                self._extract_region_mean(frame, right_cheek_points, h, w))
+    
+    def _extract_region_mask(self, frame, points, h, w):
         """
         Helper untuk extract region mask dari landmarks.
+        
+        Hanya bounding box polygon yang di-mask dan disalin, bukan seluruh frame.
+        
+        Returns:
+            Tuple of (roi, mask) atau (None, None); mask adalah salinan sendiri
         """
-        # Get pixel coordinates
-        points = []
-        for idx in indices:
-            landmark = face_landmarks.landmark[idx]
-            x = int(landmark.x * w)
-            y = int(landmark.y * h)
-            points.append([x, y])
+        region = self._region_mask(points, h, w)
+        if region is None:
+            return None, None
+        x0, y0, x1, y1, mask = region
+        
+        # Extract region
+        patch = frame[y0:y1, x0:x1]
+        roi = cv2.bitwise_and(patch, patch, mask=mask)
         
+        return roi, mask.copy()
+    
+    def _extract_region_mean(self, frame, points, h, w):
+        """
+        Helper untuk mean RGB di dalam polygon (cv2.mean dengan mask, SIMD di OpenCV).
+        """
+        region = self._region_mask(points, h, w)
+        if region is None:
+            return None
+        x0, y0, x1, y1, mask = region
+        
+        return self.roi_mean(frame[y0:y1, x0:x1], mask)
+    
+    @staticmethod
+    def roi_mean(roi, mask):
+        """
+        Mean RGB di dalam mask polygon (cv2.mean dengan mask, SIMD di OpenCV).
+        
+        Args:
+            roi: Potongan bounding box ROI (BGR), misalnya dari extract_roi
+            mask: Mask polygon seukuran roi
+            
+        Returns:
+            numpy array [R, G, B] atau None jika mask kosong
+        """
+        if roi is None or mask is None or cv2.countNonZero(mask) == 0:
+            return None
+        
+        b_mean, g_mean, r_mean, _ = cv2.mean(roi, mask=mask)
+        
+        return np.array([r_mean, g_mean, b_mean])
+    
+    def _region_mask(self, points, h, w):
+        """
+        Helper untuk bounding box polygon (di-clip ke frame) dan mask polygon di dalamnya.
+        
+        Returns:
+            Tuple of (x0, y0, x1, y1, mask) atau None jika polygon tidak valid
+            (mask adalah view ke buffer persisten, valid sampai panggilan berikutnya)
+        """
         if len(points) < 3:
             return None
         
-        # Create mask
-        mask = np.zeros((h, w), dtype=np.uint8)
-        points = np.array(points, dtype=np.int32)
-        cv2.fillConvexPoly(mask, points, 255)
+        # Bounding box polygon, di-clip ke frame
+        x, y, bw, bh = cv2.boundingRect(points)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + bw, w), min(y + bh, h)
         
-        # Extract region
-        roi = cv2.bitwise_and(frame, frame, mask=mask)
+        if x1 <= x0 or y1 <= y0:
+            return None
         
-        return roi
+        # Create mask seukuran bounding box (reuse buffer, cukup di-nol-kan per ROI)
+        if self._mask_buf is None or self._mask_buf.shape != (h, w):
+            self._mask_buf = np.empty((h, w), dtype=np.uint8)
+        mask = self._mask_buf[:y1 - y0, :x1 - x0]
+        mask.fill(0)
+        cv2.fillConvexPoly(mask, points - np.array([x0, y0], dtype=np.int32), 255)
+        
+        return x0, y0, x1, y1, mask
     
     def draw_face_mesh(self, frame, face_landmarks):
         """
-        Draw face mesh pada frame untuk visualization.
+        Draw face mesh pada frame untuk visualization (in place, frame diubah).
         
         Args:
             frame: Input BGR image
             face_landmarks: Face mesh landmarks
             
         Returns:
-            Frame dengan face mesh tergambar
+            Frame yang sama dengan face mesh tergambar
         """
         if face_landmarks is None:
             return frame
         
         h, w = frame.shape[:2]
-        annotated_frame = frame.copy()
+        annotated_frame = frame
+        
+        forehead_points, left_cheek_points, right_cheek_points = self._roi_points(face_landmarks, h, w)
         
         # Draw forehead ROI
-        self._draw_roi_boundary(annotated_frame, face_landmarks, 
-                                self.forehead_indices, h, w, (0, 255, 0))
+        self._draw_roi_boundary(annotated_frame, forehead_points, (0, 255, 0))
         
         # Draw cheek ROIs
-        self._draw_roi_boundary(annotated_frame, face_landmarks, 
-                                self.left_cheek_indices, h, w, (255, 0, 0))
-        self._draw_roi_boundary(annotated_frame, face_landmarks, 
-                                self.right_cheek_indices, h, w, (0, 0, 255))
+        self._draw_roi_boundary(annotated_frame, left_cheek_points, (255, 0, 0))
+        self._draw_roi_boundary(annotated_frame, right_cheek_points, (0, 0, 255))
         
         return annotated_frame
     
-    def _draw_roi_boundary(self, frame, face_landmarks, indices, h, w, color):
+    def _draw_roi_boundary(self, frame, points, color):
         """
         Helper untuk draw ROI boundary.
         """
-        points = []
-        for idx in indices:
-            landmark = face_landmarks.landmark[idx]
-            x = int(landmark.x * w)
-            y = int(landmark.y * h)
-            points.append([x, y])
-        
         if len(points) >= 3:
-            points = np.array(points, dtype=np.int32)
             cv2.polylines(frame, [points], True, color, 2)
     
+    def _roi_points(self, face_landmarks, h, w):
+        """
+        Helper untuk koordinat pixel ketiga ROI (forehead, left cheek, right cheek).
+        
+        Satu gather vektor untuk semua indeks ROI, di-cache per objek landmarks
+        sehingga extract_roi dan draw_face_mesh pada frame yang sama tidak
+        mengonversi ulang.
+        """
+        if face_landmarks is not self._points_landmarks or (h, w) != self._points_shape:
+            points = self._landmark_points(face_landmarks, self._roi_indices, h, w)
+            self._points_cache = np.split(points, self._roi_splits)
+            self._points_landmarks = face_landmarks
+            self._points_shape = (h, w)
+        
+        return self._points_cache
+    
+    @staticmethod
+    def _landmark_points(face_landmarks, indices, h, w):
+        """
+        Helper untuk konversi landmark terpilih ke koordinat pixel (int32, N x 2).
+        """
+        landmarks = face_landmarks.landmark
+        coords = np.fromiter(
+            (c for idx in indices for c in (landmarks[idx].x, landmarks[idx].y)),
+            dtype=np.float64, count=2 * len(indices)
+        ).reshape(-1, 2)
+        return (coords * (w, h)).astype(np.int32)
+    
     def __del__(self):
         """Cleanup MediaPipe resources."""
         if hasattr(self, 'face_mesh'):
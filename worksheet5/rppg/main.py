@@ -10,6 +10,7 @@ Date: November 2025
 import cv2
 import numpy as np
 import time
+import threading
 from collections import deque
 
 # Import our modules
@@ -74,6 +75,22 @@ class FullscreenRPPGSystem:
         self.total_frames = 0
         self.successful_frames = 0
         
+        # Face mesh hanya dijalankan setiap _detect_every frame; frame di antaranya
+        # memakai landmarks terakhir (wajah hampir tidak bergeser antar frame 30 FPS)
+        self._detect_every = 2
+        self._frame_idx = 0
+        self._landmark_cache = None
+        
+        # Pulse terakhir yang sudah diestimasi (pos_method me-reuse pulse antar recompute)
+        self._last_pulse = None
+        
+        # Capture thread: frame terbaru (1 slot) dibagi ke main loop
+        self._frame_lock = threading.Lock()
+        self._frame_ready = threading.Event()
+        self._latest_frame = None
+        self._capture_thread = None
+        self._last_warn_t = 0.0  # Rate limit warning gagal baca kamera
+        
         print("✅ System initialized successfully!")
         print()
         print("📌 Instructions:")
@@ -97,8 +114,12 @@ class FullscreenRPPGSystem:
         """
         self.total_frames += 1
         
-        # Face detection
-        face_mesh = self.face_detector.detect(frame)
+        # Face detection (atau reuse landmarks dari frame sebelumnya)
+        reused = self._landmark_cache is not None and self._frame_idx % self._detect_every != 0
+        self._frame_idx += 1
+        if not reused:
+            self._landmark_cache = self.face_detector.detect(frame)
+        face_mesh = self._landmark_cache
         
         if face_mesh is None:
             # No face detected
@@ -112,10 +133,15 @@ class FullscreenRPPGSystem:
             )
             return canvas
         
-        # Extract ROIs
-        forehead_roi, left_cheek_roi, right_cheek_roi = self.face_detector.extract_roi(frame, face_mesh)
+        # Extract ROIs beserta mask polygon (dipakai ulang untuk quality assessment)
+        rois, roi_masks = self.face_detector.extract_roi(frame, face_mesh, return_masks=True)
         
-        if forehead_roi is None:
+        if rois[0] is None and reused:
+            # Landmarks lama tidak lagi valid, deteksi ulang pada frame ini
+            face_mesh = self._landmark_cache = self.face_detector.detect(frame)
+            rois, roi_masks = self.face_detector.extract_roi(frame, face_mesh, return_masks=True)
+        
+        if rois[0] is None:
             canvas = self.visualizer.update(
                 video_frame=frame,
                 bpm=None,
@@ -130,18 +156,20 @@ class FullscreenRPPGSystem:
         roi_signals = []
         roi_qualities = []
         
-        for roi in [forehead_roi, left_cheek_roi, right_cheek_roi]:
+        for roi, mask in zip(rois, roi_masks):
             if roi is not None:
-                # Extract signal
-                rgb = self.signal_processor.extract_signal(roi)
+                # Extract signal: mean RGB dengan mask polygon dari extract_roi
+                # (polygon tidak di-rasterisasi ulang)
+                rgb = self.face_detector.roi_mean(roi, mask)
                 if rgb is not None:
                     # Assess quality
-                    quality = self.roi_selector.assess_roi_quality(roi)
+                    quality = self.roi_selector.assess_roi_quality(roi, mask)
                     roi_signals.append(rgb)
                     roi_qualities.append(quality)
         
         # Draw ROI pada video frame untuk feedback
-        frame_with_roi = frame.copy()
+        # (langsung pada frame: ROI sudah diekstrak dan frame tidak dipakai lagi)
+        frame_with_roi = frame
         if face_mesh is not None:
             frame_with_roi = self.face_detector.draw_face_mesh(frame_with_roi, face_mesh)
         
@@ -155,14 +183,12 @@ class FullscreenRPPGSystem:
             self.roi_quality = roi_qualities[0]
         else:
             # Weighted fusion
-            qualities = np.array(roi_qualities)
-            qualities = qualities / (np.sum(qualities) + 1e-8)  # Normalize weights
-            
-            rgb_signal = np.zeros(3)
-            for sig, weight in zip(roi_signals, qualities):
-                rgb_signal += sig * weight
+            qualities = np.asarray(roi_qualities)
+            self.roi_quality = qualities.mean()  # Average quality
             
-            self.roi_quality = np.mean(roi_qualities)  # Average quality
+            # Normalize weights in place, lalu satu dot product (K,) @ (K, 3)
+            qualities /= qualities.sum() + 1e-8
+            rgb_signal = qualities @ np.stack(roi_signals)
         
         if rgb_signal is not None:
             self.successful_frames += 1
@@ -173,11 +199,14 @@ class FullscreenRPPGSystem:
             )
             
             # Process jika buffer cukup (minimal 6 detik - balanced)
-            if len(self.signal_processor.red_buffer) >= self.fps * 6:
+            if self.signal_processor.num_samples >= self.fps * 6:
                 # Get pulse signal
                 pulse_signal = self.signal_processor.pos_method()
                 
-                if pulse_signal is not None:
+                # Estimasi hanya untuk pulse baru (bukan pulse cache yang sama)
+                if pulse_signal is not None and pulse_signal is not self._last_pulse:
+                    self._last_pulse = pulse_signal
+                    
                     # Estimate BPM dengan advanced metrics
                     result = self.signal_processor.estimate_bpm_with_confidence(pulse_signal)
                     
@@ -230,17 +259,19 @@ class FullscreenRPPGSystem:
         frame_count = 0
         start_time = time.time()
         
+        # Camera I/O di thread sendiri supaya cap.read() tidak menahan processing
+        self._capture_thread = threading.Thread(target=self._capture_loop, args=(cap,), daemon=True)
+        self._capture_thread.start()
+        
         try:
             while self.running:
-                ret, frame = cap.read()
+                frame = self._next_frame()
                 
-                if not ret:
-                    print("⚠ Warning: Failed to grab frame")
+                if frame is None:
+                    # Belum ada frame baru; tetap layani event window
+                    cv2.waitKey(1)
                     continue
                 
-                # Flip frame untuk mirror effect
-                frame = cv2.flip(frame, 1)
-                
                 frame_count += 1
                 
                 # Process frame
@@ -280,12 +311,59 @@ class FullscreenRPPGSystem:
             # Cleanup
             self.cleanup(cap, start_time, frame_count)
     
+    def _capture_loop(self, cap):
+        """
+        Thread capture: baca kamera terus-menerus, simpan hanya frame terbaru.
+        """
+        while self.running:
+            ret, frame = cap.read()
+            
+            if not ret:
+                # Kamera gagal/terlepas: read() langsung return, jadi warning
+                # dibatasi sekali per detik dan thread mengalah sebentar
+                now = time.monotonic()
+                if now - self._last_warn_t > 1.0:
+                    print("⚠ Warning: Failed to grab frame")
+                    self._last_warn_t = now
+                time.sleep(0.01)
+                continue
+            
+            # Flip frame untuk mirror effect
+            frame = cv2.flip(frame, 1)
+            
+            # Frame lama yang belum diproses langsung ditimpa
+            with self._frame_lock:
+                self._latest_frame = frame
+            self._frame_ready.set()
+    
+    def _next_frame(self, timeout=0.1):
+        """
+        Ambil frame terbaru dari capture thread.
+        
+        Returns:
+            Frame baru atau None jika tidak ada frame dalam timeout
+        """
+        if not self._frame_ready.wait(timeout):
+            return None
+        
+        # Setiap frame dari capture thread adalah array baru, jadi tidak perlu copy
+        with self._frame_lock:
+            frame = self._latest_frame
+            self._latest_frame = None
+            self._frame_ready.clear()
+        
+        return frame
+    
     def cleanup(self, cap, start_time, frame_count):
         """
         Cleanup resources dan print session summary.
         """
         self.running = False
         
+        if self._capture_thread is not None:
+            self._capture_thread.join()
+            self._capture_thread = None
+        
         if cap is not None:
             cap.release()
         cv2.destroyAllWindows()
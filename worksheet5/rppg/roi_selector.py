@@ -16,12 +16,14 @@ class AdaptiveROISelector:
         """Initialize adaptive ROI selector."""
         pass
     
-    def assess_roi_quality(self, roi):
+    def assess_roi_quality(self, roi, mask=None):
         """
         Assess quality dari ROI berdasarkan multiple metrics.
         
         Args:
             roi: ROI image (BGR format)
+            mask: Mask polygon ROI (uint8, seukuran roi) dari face detector;
+                jika None, mask diturunkan dari pixel non-zero ROI
             
         Returns:
             Quality score (0-1)
@@ -29,32 +31,33 @@ class AdaptiveROISelector:
         if roi is None or roi.size == 0:
             return 0.0
         
-        # Get mask
-        gray_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if len(roi.shape) == 3 else roi
-        mask = gray_roi > 0
+        # Get mask (pixel non-zero = bagian ROI; OpenCV memakai gray_roi langsung sebagai mask)
+        if mask is None:
+            mask = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if len(roi.shape) == 3 else roi
         
-        if np.sum(mask) < 10:  # Terlalu kecil
+        if cv2.countNonZero(mask) < 10:  # Terlalu kecil
             return 0.0
         
-        # 1. Exposure quality (brightness)
-        brightness = np.mean(gray_roi[mask])
+        # Mean dan std ketiga channel sekaligus dalam satu reduksi masked
+        # (menggantikan split + boolean indexing + mean/std per channel)
+        channel_means, channel_stds = cv2.meanStdDev(roi, mask=mask)
+        blue_mean, green_mean, red_mean = channel_means.ravel()
+        
+        # 1. Exposure quality (brightness = luma BT.601 dari mean channel,
+        # tanpa membuat gambar grayscale)
+        brightness = 0.299 * red_mean + 0.587 * green_mean + 0.114 * blue_mean
         if brightness < 50 or brightness > 200:
             exposure_score = 0.3
         else:
             # Optimal range: 80-180
+            # (untuk brightness 50-200 nilainya selalu di [0.38, 1], tanpa clamp)
             exposure_score = 1.0 - abs(brightness - 130) / 130.0
-            exposure_score = max(0, min(1, exposure_score))
         
         # 2. Saturation (color richness)
-        b, g, r = cv2.split(roi)
-        saturation = np.std(r[mask]) + np.std(g[mask]) + np.std(b[mask])
+        saturation = channel_stds.sum()
         saturation_score = min(saturation / 100.0, 1.0)
         
         # 3. Green channel prominence (important for blood volume changes)
-        green_mean = np.mean(g[mask])
-        red_mean = np.mean(r[mask])
-        blue_mean = np.mean(b[mask])
-        
         # Green should be prominent
         green_prominence = green_mean / (red_mean + blue_mean + 1e-8)
         green_score = min(green_prominence / 2.0, 1.0)
@@ -5,9 +5,84 @@ Implements POS (Plane-Orthogonal-to-Skin) method with advanced quality metrics.
 
 import numpy as np
 import cv2
-from scipy import signal, interpolate
-from scipy.stats import kurtosis
+from scipy import signal, interpolate, ndimage
+from scipy import fft as sfft
 from collections import deque
+from numba import njit
+
+
+@njit(cache=True, fastmath=True)
+def _sqi_kernel(x):
+    """
+    SQI dalam dua pass: variance, variance turunan pertama, dan kurtosis
+    (Fisher, biased, sama dengan scipy.stats.kurtosis).
+    """
+    n = len(x)
+    
+    # Pass 1: mean sinyal dan mean diff (telescoping)
+    s = 0.0
+    for i in range(n):
+        s += x[i]
+    mean = s / n
+    mean_d = (x[n - 1] - x[0]) / (n - 1)
+    
+    # Pass 2: central moments dan variance diff
+    m2 = 0.0
+    m4 = 0.0
+    d2 = 0.0
+    for i in range(n):
+        v = x[i] - mean
+        v2 = v * v
+        m2 += v2
+        m4 += v2 * v2
+        if i > 0:
+            d = (x[i] - x[i - 1]) - mean_d
+            d2 += d * d
+    
+    signal_power = m2 / n
+    
+    # Sinyal flat (ROI saturasi, kamera freeze) tidak punya pulse dan
+    # kurtosis-nya tidak terdefinisi
+    if signal_power <= 1e-12:
+        return 0.0
+    
+    # 1. SNR, noise dari high-frequency components
+    noise_estimate = d2 / (n - 1) / 2.0
+    snr_score = min(signal_power / (noise_estimate + 1e-8) / 10.0, 1.0)
+    
+    # 2. Kurtosis
+    kurt = (m4 / n) / (signal_power * signal_power) - 3.0
+    kurt_score = np.exp(-abs(kurt) / 8.0)
+    
+    # 3. Signal variance
+    variance_score = min(signal_power / 300.0, 1.0)
+    
+    # Combined SQI (weights 0.5, 0.25, 0.25) + boost low light
+    sqi = 0.5 * snr_score + 0.25 * kurt_score + 0.25 * variance_score
+    return min(sqi * 1.2, 1.0)
+
+
+@njit(cache=True, fastmath=True)
+def _variance_ratio_kernel(x, chunk_size):
+    """
+    |var(recent) - var(older)| / var(older) untuk dua chunk terakhir sepanjang chunk_size.
+    """
+    n = len(x)
+    var = np.empty(2)
+    for k in range(2):
+        start = n - (2 - k) * chunk_size
+        s = 0.0
+        for i in range(start, start + chunk_size):
+            s += x[i]
+        mean = s / chunk_size
+        acc = 0.0
+        for i in range(start, start + chunk_size):
+            d = x[i] - mean
+            acc += d * d
+        var[k] = acc / chunk_size
+    older_var = var[0]
+    recent_var = var[1]
+    return abs(recent_var - older_var) / (older_var + 1e-8)
 
 
 class SignalProcessor:
@@ -27,21 +102,52 @@ class SignalProcessor:
         self.window_size = window_size
         self.buffer_size = fps * window_size
         
-        # Signal buffers - Multi ROI support
-        self.red_buffer = deque(maxlen=self.buffer_size)
-        self.green_buffer = deque(maxlen=self.buffer_size)
-        self.blue_buffer = deque(maxlen=self.buffer_size)
+        # Signal buffer - satu ring buffer (3 x buffer_size), baris R, G, B
+        self._rgb = np.full((3, self.buffer_size), np.nan, dtype=np.float32)
+        self._n = 0  # Total sample yang pernah ditulis
+        
+        # Scratch untuk window berurutan (flat, supaya N sample pertama contiguous)
+        self._scratch = np.empty(3 * self.buffer_size, dtype=np.float32)
+        
+        # POS cukup dihitung ulang setiap beberapa frame (~6 Hz); BPM berubah lambat
+        self._recompute_every = max(1, self.fps // 6)
+        self._frame_counter = 0
+        self._last_pulse = None
+        
+        # Basis detrending kuadratik [1, x, x^2] dan pseudoinverse-nya, di-cache
+        # per panjang window (hanya berubah selama buffer belum penuh)
+        self._poly_n = 0
+        self._poly_V = None
+        self._poly_pinv = None
+        
+        # Kernel median filter ~0.1 detik (ganjil), dihitung sekali
+        self._medfilt_k = max(3, int(fps / 10)) | 1
+        
+        # Bandpass Butterworth (0.67 - 4.0 Hz => 40 - 240 BPM) dalam bentuk SOS,
+        # didesain sekali karena band-nya tetap
+        nyquist = fps / 2.0
+        self._sos_fixed = signal.butter(
+            3, [0.67 / nyquist, 4.0 / nyquist], btype='band', output='sos'
+        )
+        
+        # Cache frekuensi rFFT per (panjang sinyal, band) dan spectrum terakhir
+        # (FFT dan peak detection memakai sinyal filtered yang sama)
+        self._band_cache = {}
+        self._spectrum_src = None
+        self._spectrum_mags = None
         
         # Quality tracking untuk adaptive processing
         self.quality_buffer = deque(maxlen=100)
         self.bpm_history = deque(maxlen=30)  # Track untuk consistency
     
-    def extract_signal(self, roi):
+    def extract_signal(self, roi, mask=None):
         """
         Extract RGB signal dari ROI.
         
         Args:
             roi: ROI image (BGR format)
+            mask: Mask polygon ROI (uint8, seukuran roi) dari face detector;
+                jika None, mask diturunkan dari pixel non-zero ROI
             
         Returns:
             numpy array [R, G, B] atau None jika ROI invalid
@@ -49,19 +155,15 @@ class SignalProcessor:
         if roi is None or roi.size == 0:
             return None
         
-        # Get mask dari ROI (non-zero pixels)
-        gray_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if len(roi.shape) == 3 else roi
-        mask = gray_roi > 0
-        
-        if np.sum(mask) == 0:
+        # Get mask dari ROI (non-zero pixels) jika tidak diberikan
+        if mask is None:
+            mask = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY) if len(roi.shape) == 3 else roi
+        if cv2.countNonZero(mask) == 0:
             return None
         
-        # Extract mean RGB values dari ROI
-        b, g, r = cv2.split(roi)
-        
-        r_mean = np.mean(r[mask]) if np.sum(mask) > 0 else 0
-        g_mean = np.mean(g[mask]) if np.sum(mask) > 0 else 0
-        b_mean = np.mean(b[mask]) if np.sum(mask) > 0 else 0
+        # Extract mean RGB values dari ROI langsung dari uint8
+        # (cv2.mean dengan mask: satu reduksi, tanpa split/salinan float)
+        b_mean, g_mean, r_mean, _ = cv2.mean(roi, mask=mask)
         
         return np.array([r_mean, g_mean, b_mean])
     
@@ -72,69 +174,117 @@ class SignalProcessor:
         Args:
             r, g, b: RGB values (bisa berupa nan untuk missing frames)
         """
-        self.red_buffer.append(r)
-        self.green_buffer.append(g)
-        self.blue_buffer.append(b)
+        self._rgb[:, self._n % self.buffer_size] = (r, g, b)
+        self._n += 1
+    
+    @property
+    def num_samples(self):
+        """Jumlah sample yang ada di buffer."""
+        return min(self._n, self.buffer_size)
+    
+    def _window(self):
+        """
+        Salinan buffer berurutan kronologis (sample terlama dulu), shape (3, N).
+        Ditulis ke scratch buffer yang sama setiap panggilan (tanpa alokasi).
+        """
+        n = self.num_samples
+        window = self._scratch[:3 * n].reshape(3, n)
+        if self._n < self.buffer_size:
+            np.copyto(window, self._rgb[:, :n])
+        else:
+            cur = self._n % self.buffer_size
+            np.concatenate((self._rgb[:, cur:], self._rgb[:, :cur]), axis=1, out=window)
+        return window
     
     def pos_method(self):
         """
         Plane-Orthogonal-to-Skin (POS) method untuk extract pulse signal.
         
+        Dihitung ulang hanya setiap _recompute_every panggilan; di antaranya
+        pulse terakhir (objek yang sama) dikembalikan.
+        
         Returns:
             Pulse signal atau None jika buffer belum cukup
         """
-        if len(self.red_buffer) < self.fps * 3:  # Minimal 3 detik
+        if self.num_samples < self.fps * 3:  # Minimal 3 detik
             return None
         
-        # Convert buffers ke arrays
-        red = np.array(list(self.red_buffer))
-        green = np.array(list(self.green_buffer))
-        blue = np.array(list(self.blue_buffer))
-        
-        # Handle NaN values dengan interpolation
-        red = self._interpolate_nans(red)
-        green = self._interpolate_nans(green)
-        blue = self._interpolate_nans(blue)
-        
-        # Normalisasi signals
-        red_norm = (red - np.mean(red)) / (np.std(red) + 1e-8)
-        green_norm = (green - np.mean(green)) / (np.std(green) + 1e-8)
-        blue_norm = (blue - np.mean(blue)) / (np.std(blue) + 1e-8)
-        
-        # POS algorithm
-        X = np.vstack([red_norm, green_norm, blue_norm])
+        self._frame_counter += 1
+        if self._last_pulse is not None and self._frame_counter % self._recompute_every != 0:
+            return self._last_pulse
         
-        # Projection matrix
-        C = np.array([[0, 1, -1], [-2, 1, 1]])
+        # Buffer ke matrix [R, G, B] x N
+        X = self._window()
         
-        # Project signals
-        S = np.dot(C, X)
+        # Handle NaN values dengan interpolation (hanya baris yang mengandung NaN)
+        for c in np.flatnonzero(np.isnan(X).any(axis=1)):
+            X[c] = self._interpolate_nans(X[c])
         
-        # Pulse signal dengan weighted combination
-        alpha = np.std(S[0, :]) / (np.std(S[1, :]) + 1e-8)
-        h = S[0, :] + alpha * S[1, :]
+        # Normalisasi signals (per baris), in place di scratch window
+        std = X.std(axis=1, keepdims=True)
+        X -= X.mean(axis=1, keepdims=True)
+        X /= std + 1e-8
         
-        # Advanced detrending: polynomial + linear
-        # Remove polynomial trend (menghilangkan drift)
-        z = np.polyfit(np.arange(len(h)), h, 2)
-        p = np.poly1d(z)
-        h = h - p(np.arange(len(h)))
-        
-        # Additional linear detrend
-        h = signal.detrend(h, type='linear')
-        
-        # Temporal smoothing dengan moving average (reduce noise)
-        kernel_size = max(3, int(self.fps / 10))  # ~0.1 detik
-        if kernel_size % 2 == 0:
-            kernel_size += 1
-        h = signal.medfilt(h, kernel_size=kernel_size)
+        # POS algorithm
+        # Projection C = [[0, 1, -1], [-2, 1, 1]] ditulis langsung (tanpa matmul)
+        red, green, blue = X
+        S0 = green - blue
+        S1 = green + blue
+        S1 -= 2.0 * red
+        
+        # Pulse signal dengan weighted combination. S0 dan S1 kombinasi linear
+        # dari baris zero-mean, jadi std cukup dari dot product (tanpa pass mean)
+        n = len(S0)
+        alpha = np.sqrt(S0 @ S0 / n) / (np.sqrt(S1 @ S1 / n) + 1e-8)
+        h = S1
+        h *= alpha
+        h += S0
+        
+        # Advanced detrending: remove polynomial trend (menghilangkan drift)
+        # Least squares via pseudoinverse yang di-cache: dua matvec, tanpa SVD per panggilan.
+        # Residual sudah ortogonal terhadap trend linear, jadi detrend linear tidak perlu lagi.
+        V, V_pinv = self._detrend_basis(len(h))
+        h -= V @ (V_pinv @ h)  # In place: tetap float32
+        
+        # Temporal smoothing dengan median filter (reduce noise)
+        if self._medfilt_k == 3:
+            h = self._median3(h)
+        else:
+            h = ndimage.median_filter(h, size=self._medfilt_k, mode='constant')
         
+        self._last_pulse = h
         return h
     
+    def _detrend_basis(self, n):
+        """
+        Basis kuadratik (n x 3) dan pseudoinverse-nya (3 x n), di-cache per n.
+        """
+        if n != self._poly_n:
+            # x di-skala ke [-1, 1] supaya basis well-conditioned
+            t = np.linspace(-1.0, 1.0, n)
+            V = np.stack([np.ones_like(t), t, t * t], axis=1)
+            self._poly_V = V.astype(np.float32)
+            self._poly_pinv = np.linalg.pinv(V).astype(np.float32)
+            self._poly_n = n
+        
+        return self._poly_V, self._poly_pinv
+    
+    @staticmethod
+    def _median3(h):
+        """
+        Median filter 3-tap tanpa sorting: med3(a, b, c) = max(min(a, b), min(c, max(a, b))).
+        Tepi di-pad nol seperti signal.medfilt.
+        """
+        padded = np.zeros(len(h) + 2, dtype=h.dtype)
+        padded[1:-1] = h
+        a, b, c = padded[:-2], padded[1:-1], padded[2:]
+        return np.maximum(np.minimum(a, b), np.minimum(c, np.maximum(a, b)))
+    
     def _interpolate_nans(self, signal_array):
         """
         Interpolate NaN values dalam signal.
         """
+        signal_array = signal_array.astype(np.float32, copy=False)
         nans = np.isnan(signal_array)
         if not np.any(nans):
             return signal_array
@@ -157,22 +307,14 @@ class SignalProcessor:
         if pulse_signal is None or len(pulse_signal) < self.fps:
             return None
         
-        # Bandpass filter (0.67 - 4.0 Hz => 40 - 240 BPM)
-        nyquist = self.fps / 2.0
-        low = 0.67 / nyquist
-        high = 4.0 / nyquist
-        
-        b, a = signal.butter(3, [low, high], btype='band')
-        filtered = signal.filtfilt(b, a, pulse_signal)
+        # Bandpass filter (0.67 - 4.0 Hz => 40 - 240 BPM), koefisien SOS di-cache
+        filtered = signal.sosfiltfilt(self._sos_fixed, pulse_signal)
         
         # FFT
-        fft_result = np.fft.rfft(filtered)
-        fft_freqs = np.fft.rfftfreq(len(filtered), 1.0 / self.fps)
+        fft_freqs_valid, band = self._fft_band(len(filtered), 0.67, 4.0)
+        fft_magnitudes = self._magnitude_spectrum(filtered)[band]
         
         # Find peak frequency
-        valid_indices = np.where((fft_freqs >= 0.67) & (fft_freqs <= 4.0))
-        fft_magnitudes = np.abs(fft_result[valid_indices])
-        fft_freqs_valid = fft_freqs[valid_indices]
         
         if len(fft_magnitudes) == 0:
             return None
@@ -184,6 +326,38 @@ class SignalProcessor:
         bpm = peak_freq * 60.0
         
         return bpm
+    
+    def _fft_band(self, n, low_hz, high_hz):
+        """
+        Frekuensi rFFT dalam band [low_hz, high_hz] untuk sinyal panjang n.
+        
+        Frekuensi rFFT naik monoton, jadi band cukup berupa slice (view, tanpa
+        fancy indexing). Di-cache per (n, band); n hanya berubah selama buffer
+        belum penuh.
+        
+        Returns:
+            Tuple of (frekuensi dalam band, slice bin)
+        """
+        key = (n, low_hz, high_hz)
+        entry = self._band_cache.get(key)
+        if entry is None:
+            freqs = np.fft.rfftfreq(n, 1.0 / self.fps)
+            band = slice(
+                int(np.searchsorted(freqs, low_hz, side='left')),
+                int(np.searchsorted(freqs, high_hz, side='right'))
+            )
+            entry = (freqs[band], band)
+            self._band_cache[key] = entry
+        return entry
+    
+    def _magnitude_spectrum(self, x):
+        """
+        Magnitude rFFT dari x, dipakai ulang jika x sama dengan pemanggilan sebelumnya.
+        """
+        if x is not self._spectrum_src:
+            self._spectrum_mags = np.abs(sfft.rfft(x, workers=1))
+            self._spectrum_src = x
+        return self._spectrum_mags
 
 
 class AdvancedSignalProcessor(SignalProcessor):
@@ -197,6 +371,9 @@ class AdvancedSignalProcessor(SignalProcessor):
         # Motion detection
         self.motion_detected = False
         self.previous_signal_chunk = None
+        
+        # Cache desain filter adaptive, key (low_bpm, high_bpm) dibulatkan
+        self._sos_cache = {}
     
     def estimate_bpm_with_confidence(self, pulse_signal):
         """
@@ -216,8 +393,6 @@ class AdvancedSignalProcessor(SignalProcessor):
             return None, 0.0, sqi
         
         # Adaptive bandpass filter berdasarkan expected BPM range
-        nyquist = self.fps / 2.0
-        
         # Jika ada history, use adaptive range
         if len(self.bpm_history) > 5:
             avg_bpm = np.median(list(self.bpm_history))
@@ -227,12 +402,9 @@ class AdvancedSignalProcessor(SignalProcessor):
             low_bpm = 45  # Lebih narrow untuk lebih akurat
             high_bpm = 150
         
-        low = (low_bpm / 60.0) / nyquist
-        high = (high_bpm / 60.0) / nyquist
-        
         # Higher order Butterworth untuk better frequency selectivity
-        b, a = signal.butter(4, [low, high], btype='band')
-        filtered = signal.filtfilt(b, a, pulse_signal)
+        sos = self._adaptive_sos(low_bpm, high_bpm)
+        filtered = signal.sosfiltfilt(sos, pulse_signal)
         
         # Multi-method BPM estimation
         bpm_fft, conf_fft = self._estimate_bpm_fft(filtered)
@@ -295,6 +467,23 @@ class AdvancedSignalProcessor(SignalProcessor):
         
         return bpm, confidence, sqi
     
+    def _adaptive_sos(self, low_bpm, high_bpm):
+        """
+        Koefisien SOS Butterworth orde 4 untuk band BPM adaptive.
+        
+        Band dibulatkan ke 1 BPM supaya desain filter bisa dipakai ulang
+        selama median BPM tidak bergeser jauh.
+        """
+        key = (int(round(low_bpm)), int(round(high_bpm)))
+        sos = self._sos_cache.get(key)
+        if sos is None:
+            nyquist = self.fps / 2.0
+            low = (key[0] / 60.0) / nyquist
+            high = (key[1] / 60.0) / nyquist
+            sos = signal.butter(4, [low, high], btype='band', output='sos')
+            self._sos_cache[key] = sos
+        return sos
+    
     def _estimate_bpm_fft(self, filtered_signal):
         """
         Estimate BPM menggunakan FFT dengan peak refinement.
@@ -305,15 +494,9 @@ class AdvancedSignalProcessor(SignalProcessor):
         if len(filtered_signal) < self.fps * 3:
             return None, 0.0
         
-        # FFT
-        fft_result = np.fft.rfft(filtered_signal)
-        fft_freqs = np.fft.rfftfreq(len(filtered_signal), 1.0 / self.fps)
-        fft_magnitudes = np.abs(fft_result)
-        
-        # Valid frequency range (0.75 - 2.5 Hz => 45 - 150 BPM)
-        valid_mask = (fft_freqs >= 0.75) & (fft_freqs <= 2.5)
-        valid_mags = fft_magnitudes[valid_mask]
-        valid_freqs = fft_freqs[valid_mask]
+        # FFT, valid frequency range (0.75 - 2.5 Hz => 45 - 150 BPM)
+        valid_freqs, band = self._fft_band(len(filtered_signal), 0.75, 2.5)
+        valid_mags = self._magnitude_spectrum(filtered_signal)[band]
         
         if len(valid_mags) == 0:
             return None, 0.0
@@ -367,17 +550,21 @@ class AdvancedSignalProcessor(SignalProcessor):
         # Normalize signal
         normalized = (filtered_signal - np.mean(filtered_signal)) / (np.std(filtered_signal) + 1e-8)
         
-        # Compute autocorrelation
-        autocorr = np.correlate(normalized, normalized, mode='full')
-        autocorr = autocorr[len(autocorr)//2:]
-        
         # Expected lag range (0.4 - 1.33 sec => 45 - 150 BPM)
         min_lag = int(0.4 * self.fps)
         max_lag = int(1.33 * self.fps)
         
-        if max_lag >= len(autocorr):
+        n = len(normalized)
+        if max_lag >= n:
             return None, 0.0
         
+        # Compute autocorrelation hanya untuk lag 0 .. max_lag-1 (O(N * max_lag),
+        # bukan O(N^2) untuk seluruh 2N-1 lag): korelasi 'valid' terhadap sinyal
+        # yang di-zero-pad sepanjang max_lag - 1
+        padded = np.zeros(n + max_lag - 1)
+        padded[:n] = normalized
+        autocorr = np.correlate(padded, normalized, mode='valid')
+        
         # Find peak dalam valid range
         valid_autocorr = autocorr[min_lag:max_lag]
         peak_idx = np.argmax(valid_autocorr)
@@ -404,30 +591,8 @@ class AdvancedSignalProcessor(SignalProcessor):
         if pulse_signal is None or len(pulse_signal) < 10:
             return 0.0
         
-        # 1. SNR (Signal-to-Noise Ratio) - most important
-        signal_power = np.var(pulse_signal)
-        
-        # Noise estimate dari high-frequency components
-        noise_estimate = np.var(np.diff(pulse_signal)) / 2.0
-        snr = signal_power / (noise_estimate + 1e-8)
-        snr_score = min(snr / 10.0, 1.0)  # Relaxed threshold
-        
-        # 2. Kurtosis (peakedness - should be periodic)
-        kurt = kurtosis(pulse_signal)
-        kurt_score = np.exp(-abs(kurt) / 8.0)  # More tolerant
-        
-        # 3. Signal variance (should be significant)
-        variance_score = min(signal_power / 300.0, 1.0)  # Lower threshold
-        
-        # Combined SQI - simplified, weighted toward SNR
-        weights = [0.5, 0.25, 0.25]  # SNR dominan
-        scores = [snr_score, kurt_score, variance_score]
-        sqi = np.average(scores, weights=weights)
-        
-        # Boost SQI untuk kompensasi low light conditions
-        sqi = min(sqi * 1.2, 1.0)
-        
-        return sqi
+        # SNR (dominan), kurtosis, dan variance digabung dalam satu kernel
+        return _sqi_kernel(pulse_signal)
     
     def robust_peak_detection(self, filtered_signal):
         """
@@ -436,15 +601,9 @@ class AdvancedSignalProcessor(SignalProcessor):
         Returns:
             Tuple of (bpm, confidence)
         """
-        # FFT method
-        fft_result = np.fft.rfft(filtered_signal)
-        fft_freqs = np.fft.rfftfreq(len(filtered_signal), 1.0 / self.fps)
-        fft_magnitudes = np.abs(fft_result)
-        
-        # Valid range (40-180 BPM)
-        valid_indices = np.where((fft_freqs >= 0.67) & (fft_freqs <= 3.0))
-        fft_mags_valid = fft_magnitudes[valid_indices]
-        fft_freqs_valid = fft_freqs[valid_indices]
+        # FFT method, valid range (40-180 BPM)
+        fft_freqs_valid, band = self._fft_band(len(filtered_signal), 0.67, 3.0)
+        fft_mags_valid = self._magnitude_spectrum(filtered_signal)[band]
         
         if len(fft_mags_valid) == 0:
             return None, 0.0
@@ -487,25 +646,12 @@ class AdvancedSignalProcessor(SignalProcessor):
             self.motion_detected = False
             return
         
-        # Recent chunk
-        recent_chunk = filtered_signal[-chunk_size:]
-        
-        # Older chunk
-        older_chunk = filtered_signal[-chunk_size*2:-chunk_size]
-        
-        # Compare variance
-        recent_var = np.var(recent_chunk)
-        older_var = np.var(older_chunk)
-        
-        # Motion detected jika variance difference besar
-        variance_ratio = abs(recent_var - older_var) / (older_var + 1e-8)
+        # Motion detected jika variance chunk terbaru vs sebelumnya berbeda jauh
+        variance_ratio = _variance_ratio_kernel(filtered_signal, chunk_size)
         
         self.motion_detected = variance_ratio > 2.0
 
 
-# Import cv2 untuk extract_signal
-import cv2
-
 if __name__ == "__main__":
     print("✅ SignalProcessor modules loaded")
     print("\nBasic usage:")
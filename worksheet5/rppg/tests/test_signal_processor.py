@@ -0,0 +1,30 @@
+"""
+Regression tests for the legacy signal processor quality metrics.
+
+Run from the rppg directory:  python -m unittest discover -s tests -t .
+"""
+
+import unittest
+
+import numpy as np
+
+from signal_processor import AdvancedSignalProcessor
+
+
+class TestComputeSqi(unittest.TestCase):
+    
+    def test_constant_signal_has_zero_quality(self):
+        # Flat pulse dari buffer RGB konstan tidak boleh raise
+        processor = AdvancedSignalProcessor(fps=30)
+        self.assertEqual(processor.compute_sqi(np.zeros(300, np.float32)), 0.0)
+    
+    def test_constant_signal_estimate_is_rejected(self):
+        processor = AdvancedSignalProcessor(fps=30)
+        bpm, confidence, sqi = processor.estimate_bpm_with_confidence(np.zeros(300))
+        self.assertIsNone(bpm)
+        self.assertEqual(confidence, 0.0)
+        self.assertEqual(sqi, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+"""
+Regression tests for the fused SQI / motion kernel.
+
+Run from the rppg directory:  python -m unittest discover -s tests -t .
+"""
+
+import unittest
+
+import numpy as np
+
+from utils.signal_quality import SignalQuality
+
+
+class TestSqiMotionKernel(unittest.TestCase):
+    
+    def test_constant_signal_has_zero_quality(self):
+        # Flat window (saturated ROI, frozen camera) must not raise
+        sqi, motion = SignalQuality.compute_sqi_and_motion(
+            np.zeros(90), np.zeros(90), False
+        )
+        self.assertEqual(sqi, 0.0)
+        self.assertFalse(motion)
+    
+    def test_constant_signal_with_previous_chunk(self):
+        previous = np.sin(np.arange(90, dtype=np.float32) / 3.0)
+        signal = np.full(90, 5.0, dtype=np.float32)
+        sqi, motion = SignalQuality.compute_sqi_and_motion(signal, previous, True)
+        self.assertEqual(sqi, 0.0)
+        self.assertFalse(motion)
+        np.testing.assert_array_equal(previous, signal)
+    
+    def test_matches_compute_sqi(self):
+        signal = np.sin(np.arange(90) / 3.0)
+        sqi, _ = SignalQuality.compute_sqi_and_motion(signal, np.zeros(90), False)
+        self.assertAlmostEqual(sqi, SignalQuality.compute_sqi(signal), places=9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,7 +16,92 @@ Date: November 2025
 
 import numpy as np
 from scipy.stats import kurtosis
-from typing import Dict
+from typing import Dict, Tuple
+from numba import njit
+
+
+@njit(cache=True, fastmath=True)
+def _sqi_motion_kernel(
+    sig: np.ndarray,
+    prev: np.ndarray,
+    prev_valid: bool
+) -> Tuple[float, bool]:
+    """
+    Fused SQI, motion check and previous-chunk update.
+    
+    Produces the same SQI as SignalQuality.compute_sqi and the same motion
+    flag as SignalQuality.assess_motion, then copies sig into prev.
+    
+    Args:
+        sig: Current pulse signal (at least 10 samples)
+        prev: Previous chunk buffer, same length as sig (overwritten)
+        prev_valid: Whether prev holds a previous chunk
+        
+    Returns:
+        Tuple of (sqi, motion_detected)
+    """
+    n = len(sig)
+    
+    # Pass 1: means
+    s = 0.0
+    sp = 0.0
+    for i in range(n):
+        s += sig[i]
+        if prev_valid:
+            sp += prev[i]
+    mean = s / n
+    mean_p = sp / n
+    mean_d = (sig[n - 1] - sig[0]) / (n - 1)
+    
+    # Pass 2: central moments, derivative variance, covariance; update prev
+    m2 = 0.0
+    m4 = 0.0
+    d2 = 0.0
+    cov = 0.0
+    var_p = 0.0
+    for i in range(n):
+        x = sig[i] - mean
+        x2 = x * x
+        m2 += x2
+        m4 += x2 * x2
+        if i > 0:
+            d = (sig[i] - sig[i - 1]) - mean_d
+            d2 += d * d
+        if prev_valid:
+            y = prev[i] - mean_p
+            cov += x * y
+            var_p += y * y
+        prev[i] = sig[i]
+    
+    variance = m2 / n
+    
+    # A flat window (e.g. saturated ROI or frozen camera) carries no pulse;
+    # kurtosis is undefined there, so report zero quality
+    if variance <= 1e-12:
+        sqi = 0.0
+    else:
+        # SNR score
+        noise_estimate = d2 / (n - 1) / 2.0
+        snr_score = min(variance / (noise_estimate + 1e-10) / 10.0, 1.0)
+        
+        # Kurtosis score (Fisher, biased, as scipy.stats.kurtosis)
+        kurt = (m4 / n) / (variance * variance) - 3.0
+        kurt_score = np.exp(-abs(kurt) / 8.0)
+        
+        # Variance score
+        var_score = min(variance / 300.0, 1.0)
+        
+        sqi = 0.5 * snr_score + 0.25 * kurt_score + 0.25 * var_score
+        sqi = min(sqi * 1.2, 1.0)
+    
+    # Motion: low correlation with the previous chunk
+    motion_detected = False
+    if prev_valid:
+        denom = np.sqrt(m2 * var_p)
+        if denom > 0.0:
+            motion_detected = cov / denom < 0.7
+    
+    return sqi, motion_detected
 
 
 class SignalQuality:
@@ -172,6 +257,33 @@ class SignalQuality:
         motion_detected = corr < 0.7
         
         return motion_detected
+    
+    @staticmethod
+    def compute_sqi_and_motion(
+        signal: np.ndarray,
+        previous: np.ndarray,
+        previous_valid: bool
+    ) -> Tuple[float, bool]:
+        """
+        Compute SQI and detect motion in one pass, then store the signal.
+        
+        Equivalent to compute_sqi(signal) and assess_motion(signal, previous)
+        followed by copying signal into previous, without temporaries.
+        
+        Args:
+            signal: Current pulse signal
+            previous: Buffer holding the previous chunk, same length as
+                signal; overwritten with signal
+            previous_valid: Whether previous holds a chunk to compare with
+            
+        Returns:
+            Tuple of (sqi, motion_detected)
+        """
+        if len(signal) < 10:
+            previous[:] = signal
+            return 0.0, False
+        
+        return _sqi_motion_kernel(signal, previous, previous_valid)
 
 
 if __name__ == "__main__":
@@ -187,3 +299,4 @@ if __name__ == "__main__":
     print("  sqi = SignalQuality.compute_sqi(signal)")
     print("  details = SignalQuality.compute_sqi(signal, detailed=True)")
     print("  motion = SignalQuality.assess_motion(signal, previous)")
+    print("  sqi, motion = SignalQuality.compute_sqi_and_motion(signal, prev_buf, valid)")